@@ -0,0 +1,345 @@
+"""
+Offline pipeline benchmarks.
+
+Generates synthetic source videos, swaps the YouTube/Whisper/Gemini/TTS backends for
+deterministic stubs and times each pipeline stage in a fresh process, reporting wall/CPU
+time, throughput and peak memory. Results can be saved as a JSON baseline and later runs
+compared against it to catch regressions.
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --stages trim_video_smart process_video --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name: (duration seconds, width, height)
+SCENARIOS = {
+    "720p_60s": (60, 1280, 720),
+    "1080p_180s": (180, 1920, 1080),
+}
+
+CLIP_SECONDS = 15
+NUM_MOMENTS = 3
+FPS = 30
+
+# Settings every case runs with, on top of config.json
+BENCHMARK_CONFIG = {
+    "font_path": os.path.join(REPO_ROOT, "fonts", "Anton-Regular.ttf"),
+    "number_of_viral_moments": NUM_MOMENTS,
+    "minimum_moment_time": CLIP_SECONDS,
+    "maximum_moment_time": CLIP_SECONDS * 2,
+    "add_subtitles": True,
+    "retranscribe_subtitles": False,
+    "llm_rpm": 6000,
+    "llm_tpm": None,
+    "llm_cache_enabled": False,
+    "tts_cache_dir": "",
+    "instrumentation": False,
+}
+
+# Stage cases; each entry is (benchmark function name, config overrides)
+STAGES = {
+    "transcribe_audio": ("bench_transcribe", {}),
+    "find_best_moments": ("bench_find_moments", {}),
+    "trim_video_moviepy": ("bench_trim", {"trim_mode": "moviepy"}),
+    "trim_video_smart": ("bench_trim", {"trim_mode": "smart"}),
+    "trim_video_single_pass": ("bench_trim", {"trim_mode": "single_pass"}),
+    "reel_format_one": ("bench_reel_format_one", {}),
+    "reel_format_two": ("bench_reel_format_two", {}),
+    "add_subtitles": ("bench_add_subtitles", {}),
+    "add_subtitles_ass": ("bench_add_subtitles", {"subtitle_backend": "ass"}),
+    "apply_gaussian_blur": ("bench_gaussian_blur", {}),
+    "process_video": ("bench_process_video", {"video_type": "1"}),
+    "render_moment": ("bench_render_moment", {"video_type": "1"}),
+}
+
+# Untimed preparation some stages need; normalizing the fillers is a one-time cost, not part of a render
+SETUPS = {
+    "reel_format_two": "setup_filler_pool",
+}
+
+# Regressions smaller than this many seconds are treated as noise
+MIN_REGRESSION_SECONDS = 0.5
+
+
+def benchmark_moments(duration):
+    """NUM_MOMENTS evenly spaced CLIP_SECONDS windows of the source."""
+    step = duration / NUM_MOMENTS
+    return [
+        {
+            "start": round(idx * step, 2),
+            "end": round(idx * step + CLIP_SECONDS, 2),
+            "caption": f"Benchmark moment {idx + 1}",
+            "video_title": f"bench_moment_{idx + 1}",
+            "transcript": "",
+        }
+        for idx in range(NUM_MOMENTS)
+    ]
+
+
+# Each bench_* function runs the stage once and returns (frames processed, media seconds processed)
+
+def bench_transcribe(media, case_dir):
+    from utils.transcriber import transcribe_audio
+
+    transcribe_audio(media["source"], transcript_file=os.path.join(case_dir, "transcript.txt"))
+    return 0, media["duration"]
+
+
+def bench_find_moments(media, case_dir):
+    from benchmarks.stubs import stub_transcript
+    from utils.ai_processor import find_best_moments
+    from utils.config_loader import load_config
+
+    transcript = stub_transcript(media["duration"], load_config()["max_words_per_segment"])
+    asyncio.run(find_best_moments(transcript))
+    return 0, media["duration"]
+
+
+def bench_trim(media, case_dir):
+    from utils.video_editor import trim_video
+
+    trim_video(media["source"], benchmark_moments(media["duration"]), output_dir=case_dir)
+    return NUM_MOMENTS * CLIP_SECONDS * FPS, NUM_MOMENTS * CLIP_SECONDS
+
+
+def bench_reel_format_one(media, case_dir):
+    from utils.video_editor import reel_format_one
+
+    reel_format_one(media["clip"], os.path.join(case_dir, "reel.mp4"))
+    return CLIP_SECONDS * FPS, CLIP_SECONDS
+
+
+def setup_filler_pool(media, case_dir):
+    from utils.config_loader import load_config
+    from utils.filler_pool import prepare_filler_pool
+
+    prepare_filler_pool(load_config())
+
+
+def bench_reel_format_two(media, case_dir):
+    from utils.video_editor import reel_format_two
+
+    reel_format_two(media["clip"], os.path.join(case_dir, "reel.mp4"))
+    return CLIP_SECONDS * FPS, CLIP_SECONDS
+
+
+def bench_add_subtitles(media, case_dir):
+    from benchmarks.stubs import stub_transcript
+    from utils.config_loader import load_config
+    from utils.video_editor import add_subtitles
+
+    transcript = stub_transcript(CLIP_SECONDS, load_config()["max_words_per_segment"])
+    add_subtitles(media["vertical_clip"], os.path.join(case_dir, "subtitled.mp4"), transcript)
+    return CLIP_SECONDS * FPS, CLIP_SECONDS
+
+
+def bench_gaussian_blur(media, case_dir):
+    from moviepy.editor import VideoFileClip
+    from utils.video_editor import apply_gaussian_blur
+
+    # Decode and blur every frame without encoding, so only the blur path is measured
+    clip = VideoFileClip(media["vertical_clip"])
+    frames = sum(1 for _ in apply_gaussian_blur(clip).iter_frames())
+    clip.close()
+    return frames, CLIP_SECONDS
+
+
+def bench_process_video(media, case_dir):
+    from benchmarks.stubs import stub_transcript, stub_voice
+    from utils.config_loader import load_config
+    from utils.video_editor import process_video
+
+    transcript = stub_transcript(CLIP_SECONDS, load_config()["max_words_per_segment"])
+    process_video(
+        media["clip"], os.path.join(case_dir, "final.mp4"), stub_voice(case_dir), "Benchmark caption",
+        transcript, workdir=case_dir,
+    )
+    return CLIP_SECONDS * FPS, CLIP_SECONDS
+
+
+def bench_render_moment(media, case_dir):
+    from benchmarks.stubs import stub_transcript, stub_voice
+    from utils.config_loader import load_config
+    from utils.video_editor import render_moment
+
+    moment = benchmark_moments(media["duration"])[0]
+    transcript = stub_transcript(CLIP_SECONDS, load_config()["max_words_per_segment"])
+    render_moment(media["source"], moment, os.path.join(case_dir, "final.mp4"), stub_voice(case_dir), transcript)
+    return CLIP_SECONDS * FPS, CLIP_SECONDS
+
+
+def children_usage():
+    """(CPU seconds, peak RSS MB) of finished child processes, i.e. the ffmpeg readers and writers."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0, None
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    peak = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    return usage.ru_utime + usage.ru_stime, peak
+
+
+def prepare_case_dir(case_dir, media, overrides):
+    """Case workspace with its own config.json (the pipeline reads it from the working directory) and fillers."""
+    os.makedirs(case_dir, exist_ok=True)
+
+    with open(os.path.join(REPO_ROOT, "config.json"), "r") as file:
+        config = json.load(file)
+    config.update(BENCHMARK_CONFIG)
+    config.update(overrides)
+    with open(os.path.join(case_dir, "config.json"), "w") as file:
+        json.dump(config, file, indent=4)
+
+    fillers = os.path.join(case_dir, "video_fillers")
+    if not os.path.exists(fillers):
+        os.symlink(os.path.dirname(media["filler"]), fillers)
+
+
+def run_case(stage, media, case_dir):
+    """Runs one stage in the current (fresh) process and returns its measurements."""
+    from benchmarks.stubs import install_stubs
+    from utils.instrumentation import peak_rss_mb
+
+    os.chdir(case_dir)
+    install_stubs(media["source"], media["duration"])
+
+    if stage in SETUPS:
+        globals()[SETUPS[stage]](media, case_dir)
+
+    bench = globals()[STAGES[stage][0]]
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    frames, media_seconds = bench(media, case_dir)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    child_cpu, child_peak = children_usage()
+
+    return {
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "ffmpeg_cpu_s": round(child_cpu, 3),
+        "peak_rss_mb": round(peak_rss_mb() or 0, 1),
+        "ffmpeg_peak_rss_mb": round(child_peak or 0, 1),
+        "frames": frames,
+        "fps": round(frames / wall, 2) if frames else None,
+        "realtime_factor": round(media_seconds / wall, 2),
+    }
+
+
+def prepare_media(scenario, work_dir):
+    """Synthetic source, clip-length source, vertical clip and filler for a scenario."""
+    from benchmarks.synthetic_media import make_video
+
+    duration, width, height = SCENARIOS[scenario]
+    media_dir = os.path.join(work_dir, "media")
+    return {
+        "duration": duration,
+        "source": make_video(os.path.join(media_dir, f"source_{scenario}.mp4"), duration, width, height, FPS),
+        "clip": make_video(os.path.join(media_dir, f"clip_{width}x{height}.mp4"), CLIP_SECONDS, width, height, FPS),
+        "vertical_clip": make_video(os.path.join(media_dir, "clip_1080x1920.mp4"), CLIP_SECONDS, 1080, 1920, FPS),
+        "filler": make_video(os.path.join(media_dir, "fillers", "filler.mp4"), CLIP_SECONDS * 2, 1920, 1080, FPS),
+    }
+
+
+def run_benchmarks(scenarios, stages, work_dir):
+    """Runs every stage of every scenario in its own spawned process so peak memory is per stage."""
+    results = {}
+    for scenario in scenarios:
+        media = {key: os.path.abspath(value) if isinstance(value, str) else value
+                 for key, value in prepare_media(scenario, work_dir).items()}
+
+        for stage in stages:
+            case_dir = os.path.abspath(os.path.join(work_dir, scenario, stage))
+            prepare_case_dir(case_dir, media, STAGES[stage][1])
+            print(f"⏱️ {scenario} / {stage}...")
+
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                try:
+                    results[f"{scenario}/{stage}"] = pool.submit(run_case, stage, media, case_dir).result()
+                except Exception as e:
+                    print(f"❌ {scenario} / {stage} failed: {e}")
+                    results[f"{scenario}/{stage}"] = {"error": str(e)}
+
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Returns the cases whose wall time or peak memory grew by more than `tolerance` over the baseline."""
+    regressions = []
+    for case, result in results.items():
+        base = baseline.get(case)
+        if not base or "error" in base or "error" in result:
+            continue
+
+        if result["wall_s"] > base["wall_s"] * (1 + tolerance) and result["wall_s"] - base["wall_s"] > MIN_REGRESSION_SECONDS:
+            regressions.append(f"{case}: wall {base['wall_s']}s -> {result['wall_s']}s")
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{case}: peak RSS {base['peak_rss_mb']} MB -> {result['peak_rss_mb']} MB")
+
+    return regressions
+
+
+def print_results(results):
+    print(f"   {'case':<40} {'wall s':>8} {'cpu s':>8} {'ffmpeg s':>9} {'peak MB':>8} {'fps':>8} {'x rt':>6}")
+    for case, result in results.items():
+        if "error" in result:
+            print(f"   {case:<40} error: {result['error']}")
+            continue
+        fps = result["fps"] if result["fps"] is not None else "-"
+        print(f"   {case:<40} {result['wall_s']:>8.2f} {result['cpu_s']:>8.2f} {result['ffmpeg_cpu_s']:>9.2f} "
+              f"{result['peak_rss_mb']:>8.0f} {fps:>8} {result['realtime_factor']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the video pipeline stages.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--work-dir", default=os.path.join(REPO_ROOT, "benchmarks", ".work"))
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "results.json"))
+    parser.add_argument("--baseline", default=os.path.join(REPO_ROOT, "benchmarks", "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a case counts as a regression.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scenarios, args.stages, args.work_dir)
+    print("📊 Benchmark results:")
+    print_results(results)
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=4)
+    print(f"💾 Results saved to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️ No baseline found; run with --save-baseline to create one.")
+        return
+
+    with open(args.baseline, "r") as file:
+        baseline = json.load(file)
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("❌ Regressions against the baseline:")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+    print("✅ No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import json
+import os
+import re
+import shutil
+from types import SimpleNamespace
+from benchmarks.synthetic_media import make_tone
+
+# Deterministic filler speech for the stub transcriber
+WORDS = "so this is honestly the funniest thing that happened to me all week you will not believe it".split()
+WORD_SECONDS = 0.4
+WORDS_PER_SEGMENT = 12
+
+
+class StubWhisperModel:
+    """Stands in for faster-whisper: one word every WORD_SECONDS over the whole media duration."""
+
+    def __init__(self, duration):
+        self.duration = duration
+
+    def transcribe(self, audio, word_timestamps=True, **kwargs):
+        return self.segments(), SimpleNamespace(duration=self.duration, language="en")
+
+    def segments(self):
+        num_words = int(self.duration / WORD_SECONDS)
+        for first in range(0, num_words, WORDS_PER_SEGMENT):
+            words = [
+                SimpleNamespace(word=WORDS[idx % len(WORDS)], start=idx * WORD_SECONDS, end=(idx + 1) * WORD_SECONDS)
+                for idx in range(first, min(first + WORDS_PER_SEGMENT, num_words))
+            ]
+            yield SimpleNamespace(
+                start=words[0].start, end=words[-1].end, words=words,
+                text=" ".join(word.word for word in words),
+            )
+
+
+class StubLLMClient:
+    """Stands in for Gemini: answers the moments prompt with evenly spaced windows of the transcript it was given."""
+
+    model_name = "stub"
+
+    def generate(self, prompt):
+        num_moments = int(re.search(r"Extract (\d+)", prompt).group(1))
+        min_time = float(re.search(r"between (\S+) to", prompt).group(1))
+        times = [(float(start), float(end)) for start, end in re.findall(r"^\s*(\d+(?:\.\d+)?)-(\d+(?:\.\d+)?) ", prompt, re.M)]
+        if not times:
+            return "[]"
+
+        first, last = times[0][0], times[-1][1]
+        step = max((last - first) / max(num_moments, 1), min_time)
+        moments = []
+        for idx in range(num_moments):
+            start = first + idx * step
+            if start + min_time > last:
+                break
+            moments.append({
+                "start": round(start, 2),
+                "end": round(start + min_time, 2),
+                "transcript": "stub transcript",
+                "caption": f"Stub moment {idx + 1}",
+                "video_title": f"stub_moment_{int(start)}",
+            })
+        return json.dumps(moments)
+
+
+class StubTTS:
+    """Stands in for Coqui TTS: a tone lasting roughly as long as the text would take to read."""
+
+    def tts_to_file(self, text, file_path):
+        make_tone(file_path, max(1.0, len(text.split()) * 0.35))
+
+
+def install_stubs(source_video, duration):
+    """
+    Swaps the network and model backends for the stubs above, so the pipeline runs offline:
+    downloads copy `source_video`, Whisper/Gemini/TTS answer deterministically and instantly.
+    """
+    import utils
+    from utils import ai_voice_generator, llm_scheduler, transcriber, youtube_downloader
+
+    def download_video(url, output_dir="temp"):
+        output_file = f"{output_dir}/temp_video.mp4"
+        shutil.copy2(source_video, output_file)
+        return output_file
+
+    youtube_downloader.download_video = download_video
+    utils.download_video = download_video
+    transcriber.get_whisper_model = lambda config: StubWhisperModel(duration)
+    llm_scheduler.GeminiClient = lambda model_name: StubLLMClient()
+    ai_voice_generator.get_tts = lambda config: StubTTS()
+
+
+def stub_transcript(duration, max_words_per_segment):
+    """Transcript entries the stub Whisper model produces for `duration` seconds of media."""
+    from utils.transcriber import split_segments
+
+    return list(split_segments(StubWhisperModel(duration).segments(), max_words_per_segment))
+
+
+def stub_voice(output_dir, caption="Wait for the end of this one"):
+    output_file = os.path.join(output_dir, "stub_voice.wav")
+    StubTTS().tts_to_file(caption, output_file)
+    return output_file
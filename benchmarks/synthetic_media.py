@@ -0,0 +1,39 @@
+import os
+from utils.smart_cut import run_ffmpeg
+
+
+def make_video(output_file, duration, width, height, fps=30):
+    """
+    Writes a synthetic H.264/AAC test video: ffmpeg's `testsrc2` pattern plus a 440 Hz tone whose
+    loudness swells every few seconds, so audio energy features have something to find.
+    Existing files are reused since the content only depends on the parameters.
+    """
+    if os.path.exists(output_file):
+        return output_file
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    print(f"🧪 Generating {width}x{height} {duration}s test video {output_file}...")
+    run_ffmpeg([
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}",
+        "-f", "lavfi", "-i", f"aevalsrc=0.4*sin(2*PI*440*t)*(0.6+0.4*sin(2*PI*t/7)):s=44100:d={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-g", str(fps * 2),
+        "-c:a", "aac", "-shortest", output_file,
+    ])
+    return output_file
+
+
+def make_tone(output_file, duration, sample_rate=22050):
+    """Writes a mono 16-bit WAV tone, standing in for a synthesized voice caption."""
+    import wave
+    import numpy as np
+
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    samples = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+
+    with wave.open(output_file, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+
+    return output_file
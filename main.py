@@ -1,72 +1,444 @@
+import argparse
 import asyncio
 import os
-from utils import download_video, transcribe_audio, load_config, find_best_moments, trim_video, process_video, save_final_videos, cleanup_temp_files, generate_voice
-import moviepy.config as mpc
+import shutil
+import threading
+from contextlib import AsyncExitStack, asynccontextmanager
+import utils
+from utils.ai_processor import PROMPT_TEMPLATE_VERSION
+from utils.checkpoints import (
+    open_manifest, evict_source_cache, get_video_id, get_artifact, record_artifact, artifact_hash,
+    load_json_artifact, save_json_artifact, stage_inputs,
+    WORDS_CONFIG_KEYS, TRANSCRIPT_CONFIG_KEYS, MOMENTS_CONFIG_KEYS, CLIP_CONFIG_KEYS,
+)
+from utils.instrumentation import set_enabled, export_chrome_trace, print_summary
+from utils.filler_pool import prepare_filler_pool
+from utils.draft_preview import render_drafts, load_draft_metadata
+from utils.transcript_store import TranscriptBuilder, TranscriptStore
+from constants import FORMAT_TWO
 
-mpc.change_settings({"IMAGEMAGICK_BINARY": "/usr/bin/convert"})  # Update with correct path
 
-
-async def main():
-    config = load_config()
-    video_url = config["video_url"]
-
-    print("🔄 Processing YouTube video...")
-    video_path = download_video(video_url)
+async def finish_video_download(video_download, manifest):
+    """Waits for the background video download and checkpoints it."""
+    video_path = await video_download
 
     if not video_path:
         print("❌ Failed to download video.")
-        return
+        return None
 
-    # ✅ Step 1: Transcribe the Video
-    transcript = transcribe_audio(video_path)
-    if not transcript:
-        print("❌ Failed to transcribe video.")
-        os.remove(video_path)  # Clean up
-        return
+    if manifest:
+        record_artifact(manifest, "download", video_path)
+    return video_path
 
-    # ✅ Step 2: Find the best timestamps using Gemini
-    best_moments = find_best_moments(transcript)
-    if not best_moments:
-        print("❌ No viral moments found.")
-        os.remove(video_path)  # Clean up
+
+async def stop_video_download(video_download, cancel):
+    """
+    Stops a background video download the pipeline no longer waits for, and waits for its thread
+    to exit, so nothing keeps writing into the job or source folder once the job is over.
+    """
+    if video_download is None:
         return
+    if not video_download.done():
+        print("🛑 Stopping the video download...")
+        cancel.set()
+    await asyncio.gather(video_download, return_exceptions=True)
 
-    # ✅ Step 3: Trim the best moments into short clips
-    short_clips = trim_video(video_path, best_moments)
 
-    if not short_clips:
-        print("❌ Failed to generate short clips.")
-        return
+@asynccontextmanager
+async def stage_slot(stage, limits=None, on_stage=None):
+    """Waits for a free slot of `stage` when its concurrency is limited, then reports the stage as started."""
+    semaphore = (limits or {}).get(stage)
+    if semaphore:
+        await semaphore.acquire()
+    try:
+        if on_stage:
+            on_stage(stage)
+        yield
+    finally:
+        if semaphore:
+            semaphore.release()
+
+
+def generate_caption_voices(moments, config, job_dir):
+    """AI voice file (or a future resolving to it) for each moment's caption, or Nones when voices are off."""
+    captions = [moment["caption"] for moment in moments]
+    titles = [moment["video_title"] for moment in moments]
+    if not config["add_caption_voice"]:
+        return [None] * len(moments)
+    elif config.get("tts_background", False):
+        # Synthesize on a background thread; each clip starts rendering once its own voice is ready
+        return utils.generate_voices_background(captions, titles, output_dir=job_dir)
+    return utils.generate_voices(captions, titles, output_dir=job_dir)
+
+
+def render_clips(video_path, moments, caption_voices, clip_transcripts, job_dir, config, on_rendered):
+    """
+    Renders `moments` at full quality with the configured renderer, calling `on_rendered(moment, output_video)`
+    as each clip is written. Returns False if trimming failed; a clip that fails to render raises.
+    """
+    # Normalize the game fillers once up front and hand the pool down, so render workers only stream the cached copies
+    filler_pool = prepare_filler_pool(config) if config["video_type"] == FORMAT_TWO else None
+
+    if config.get("parallel_render", False):
+        # ✅ Step 4: Render the moments concurrently, each in its own clip workspace
+        utils.render_moments_parallel(
+            video_path, moments, caption_voices, clip_transcripts, job_dir,
+            workers=config.get("render_workers", 0), threads=config.get("ffmpeg_threads", 0), on_rendered=on_rendered,
+            filler_pool=filler_pool,
+        )
+    elif config.get("fused_render", False):
+        # ✅ Step 4: Render each moment straight from the source in a single encode
+        utils.render_moments(
+            video_path, moments, caption_voices, clip_transcripts, output_dir=job_dir, on_rendered=on_rendered, filler_pool=filler_pool
+        )
+    else:
+        # ✅ Step 4: Trim the best moments into short clips
+        short_clips = utils.trim_video(video_path, moments, output_dir=job_dir)
+
+        if not short_clips:
+            print("❌ Failed to generate short clips.")
+            return False
+
+        print(f"✅ Generated {len(short_clips)} short clips: {short_clips}")
+
+        # ✅ Step 5: Format and Enhance Each Clip
+        for moment, clip, voice, clip_transcript in zip(moments, short_clips, caption_voices, clip_transcripts):
+            output_video = f"{clip}"
+            utils.process_video(
+                clip, output_video, utils.resolve_voice(voice), moment["caption"], clip_transcript, workdir=job_dir, filler_pool=filler_pool
+            )  # Apply formatting and effects
+            on_rendered(moment, output_video)
+
+    return True
+
+
+async def process_source(video_url, job_dir, limits=None, on_stage=None, evict_cache=True, draft=False):
+    """
+    Runs the whole pipeline for one source (YouTube URL or local video file) inside `job_dir`.
+    Returns the paths of the final videos, or None if a stage failed.
+
+    `limits` maps the stage names "download", "transcribe", "llm" and "render" to semaphores capping
+    how many jobs run that stage at once (see worker.py). `on_stage(stage)` is called as each starts.
+    Blocking stages run on worker threads so several sources can share one event loop.
+    With `evict_cache` off the source cache isn't trimmed (the worker does it between jobs instead).
+    With `draft` every moment is rendered as a low-resolution proxy instead (see `render_drafts`)
+    and the draft paths are returned.
+    """
+    config = utils.load_config()
+    local_source = os.path.isfile(video_url)
+
+    # Checkpoint every stage per source video so a rerun resumes at the first missing or stale artifact
+    manifest = None
+    if config.get("resume_from_cache", False):
+        cache_dir = config.get("source_cache_dir", "cache/sources")
+        if evict_cache:
+            evict_source_cache(
+                cache_dir,
+                max_age_days=config.get("source_cache_max_age_days"),
+                max_total_mb=config.get("source_cache_max_mb"),
+                keep=get_video_id(video_url),
+            )
+        manifest = open_manifest(video_url, cache_dir)
+
+    source_dir = manifest["dir"] if manifest else job_dir
+    audio_source = config.get("audio_source", "video")
+
+    # Set to stop the background video download when the pipeline ends before it is needed
+    cancel_download = threading.Event()
+
+    async def download_video():
+        async with stage_slot("download", limits, on_stage):
+            return await asyncio.to_thread(utils.download_video, video_url, output_dir=source_dir, cancel=cancel_download)
+
+    video_path = get_artifact(manifest, "download") if manifest else None
+    video_download = None
+    try:
+        if video_path:
+            print(f"♻️ Reusing downloaded video: {video_path}")
+        elif local_source:
+            video_path = video_url
+            if manifest:
+                # Hash the local file like a download, so edits to it invalidate the later stages
+                record_artifact(manifest, "download", video_path)
+        else:
+            print("🔄 Processing YouTube video...")
+            video_download = asyncio.create_task(download_video())
+
+            # With audio_source "download" the video keeps downloading while the audio-only stream is transcribed
+            if audio_source != "download":
+                video_path = await finish_video_download(video_download, manifest)
+                if not video_path:
+                    return None
+
+        # ✅ Step 1: Transcribe the Video
+        transcript_source = "download" if audio_source == "video" else "audio"
+        transcript = None
+        words = None
+        streamed_moments = None
+        audio = None
+        max_words_per_segment = config["max_words_per_segment"]
+        if manifest:
+            words_inputs = stage_inputs(config, WORDS_CONFIG_KEYS, source=artifact_hash(manifest, transcript_source))
+            words_file = get_artifact(manifest, "words", words_inputs)
+            words = TranscriptStore.load(words_file) if words_file else None
+
+            transcript_inputs = stage_inputs(config, TRANSCRIPT_CONFIG_KEYS, source=artifact_hash(manifest, transcript_source))
+            transcript = load_json_artifact(manifest, "transcript", transcript_inputs)
+            if not transcript and words is not None:
+                # Only the segmentation changed: re-chunk the stored words instead of running Whisper again
+                transcript = words.entries(max_words_per_segment)
+                print(f"♻️ Re-segmented the stored words into {len(transcript)} lines")
+                save_json_artifact(manifest, "transcript", transcript, transcript_inputs)
+
+        if transcript:
+            print(f"♻️ Reusing transcript ({len(transcript)} lines)")
+        else:
+            # Give Whisper 16 kHz mono PCM through a memory map instead of the whole video container
+            if audio_source != "video":
+                pcm_file = get_artifact(manifest, "audio") if manifest else None
+                if not pcm_file:
+                    # Demux from the video when it is already here rather than fetching the audio stream again
+                    downloads_audio = audio_source == "download" and not video_path
+                    async with stage_slot("download", limits, on_stage):
+                        media_path = await asyncio.to_thread(utils.download_audio, video_url, output_dir=source_dir) if downloads_audio else video_path
+                        if not media_path:
+                            print("❌ Failed to download audio.")
+                            return None
+
+                        pcm_file = await asyncio.to_thread(utils.extract_pcm, media_path, os.path.join(source_dir, "audio_16k.f32"))
+                    if downloads_audio:
+                        os.remove(media_path)
+                    if manifest:
+                        record_artifact(manifest, "audio", pcm_file)
+
+                audio = utils.load_pcm(pcm_file)
 
-    print(f"✅ Generated {len(short_clips)} short clips: {short_clips}")
+            # The word timestamps are kept next to the transcript for re-segmenting and clip range queries
+            words_file = os.path.join(source_dir, "words.npz")
+            transcribing = AsyncExitStack()
+            await transcribing.enter_async_context(stage_slot("transcribe", limits, on_stage))
+            try:
+                # Pre-scoring ranks windows over the whole transcript, so with prescore_top_k ASR finishes first
+                if config.get("streaming_pipeline", False) and not config.get("prescore_top_k", 0):
+                    # Send each transcript window to the LLM as soon as it is full, overlapping ASR and LLM latency.
+                    # The transcribe slot is handed on once ASR ends; the requests themselves hold the llm slot
+                    builder = TranscriptBuilder()
+                    duration, entries = await asyncio.to_thread(utils.stream_transcript, video_path or pcm_file, audio, builder)
+                    streamed_moments, transcript = await utils.find_best_moments_streaming(
+                        entries, duration, on_transcribed=transcribing.aclose, llm_slot=stage_slot("llm", limits, on_stage)
+                    )
+                    builder.build().save(words_file)
+                    utils.save_transcript(transcript, os.path.join(job_dir, "transcript.txt"))
+                else:
+                    transcript = await asyncio.to_thread(
+                        utils.transcribe_audio, video_path or pcm_file, transcript_file=os.path.join(job_dir, "transcript.txt"),
+                        audio=audio, words_file=words_file,
+                    )
+            finally:
+                await transcribing.aclose()
 
-    # ✅ Step 4: Generate AI voice for each caption (if enabled)
-    caption_voices = []
-    captions = []
-    if config["add_caption_voice"]:
+            if not transcript:
+                print("❌ Failed to transcribe video.")
+                if not manifest and video_path and not local_source:
+                    os.remove(video_path)  # Clean up
+                return None
+
+            if os.path.exists(words_file):
+                words = TranscriptStore.load(words_file)
+            if manifest:
+                if words is not None:
+                    words_inputs = stage_inputs(config, WORDS_CONFIG_KEYS, source=artifact_hash(manifest, transcript_source))
+                    record_artifact(manifest, "words", words_file, words_inputs)
+                transcript_inputs = stage_inputs(config, TRANSCRIPT_CONFIG_KEYS, source=artifact_hash(manifest, transcript_source))
+                save_json_artifact(manifest, "transcript", transcript, transcript_inputs)
+
+        if not video_path:
+            video_path = await finish_video_download(video_download, manifest)
+            if not video_path:
+                return None
+
+        # ✅ Step 2: Find the best timestamps using Gemini
+        moments_inputs = stage_inputs(
+            config, MOMENTS_CONFIG_KEYS,
+            transcript=artifact_hash(manifest, "transcript") if manifest else None, prompt_version=PROMPT_TEMPLATE_VERSION
+        )
+        best_moments = load_json_artifact(manifest, "moments", moments_inputs) if manifest and streamed_moments is None else None
+        if best_moments:
+            print(f"♻️ Reusing {len(best_moments)} moments")
+        else:
+            # The same PCM buffer feeds the audio features of the local pre-scoring
+            if audio is None and manifest and get_artifact(manifest, "audio"):
+                audio = utils.load_pcm(get_artifact(manifest, "audio"))
+
+            if streamed_moments is not None:
+                best_moments = streamed_moments
+            else:
+                async with stage_slot("llm", limits, on_stage):
+                    best_moments = await utils.find_best_moments(transcript, audio=audio)
+            if not best_moments:
+                print("❌ No viral moments found.")
+                if not manifest and not local_source:
+                    os.remove(video_path)  # Clean up
+                return None
+
+            if manifest:
+                save_json_artifact(manifest, "moments", best_moments, moments_inputs)
+
+        def clip_transcripts_for(moments):
+            """Reuses the source transcript for subtitles instead of re-transcribing every clip."""
+            if words is not None:
+                # Binary search for each clip's lines; karaoke subtitles also get the real word timings
+                return [
+                    words.entries(max_words_per_segment, moment["start"], moment["end"], relative=True, with_words=config.get("subtitle_karaoke", False))
+                    for moment in moments
+                ]
+            return [utils.slice_transcript(transcript, moment["start"], moment["end"]) for moment in moments]
+
+        if draft:
+            # Low-resolution proxies of every moment for review; `--finalize` renders the approved ones
+            draft_dir = os.path.join(config.get("draft_folder", "drafts"), get_video_id(video_url))
+            if not manifest and not local_source:
+                # The job workspace is cleaned up, so keep the download next to the drafts for finalizing
+                os.makedirs(draft_dir, exist_ok=True)
+                kept_video = os.path.join(draft_dir, os.path.basename(video_path))
+                shutil.move(video_path, kept_video)
+                video_path = kept_video
+
+            async with stage_slot("render", limits, on_stage):
+                return await asyncio.to_thread(
+                    render_drafts, video_url, video_path, best_moments, clip_transcripts_for(best_moments), draft_dir,
+                    threads=config.get("ffmpeg_threads", 0) or None,
+                )
+
+        # Skip moments whose clip was already rendered with the same moment and settings
+        final_clips = {}
+        pending_moments = []
+        clip_inputs = {}
+        # Clips depend on the source video and, in format two, on the game fillers they are stacked over
+        fillers = None
+        if manifest and config["video_type"] == FORMAT_TWO:
+            fillers = [filler["path"] for filler in prepare_filler_pool(config)]
         for moment in best_moments:
-            voice = generate_voice(moment["caption"], moment["video_title"])
-            caption_voices.append(voice)
-            captions.append(moment["caption"])
+            clip_inputs[moment["video_title"]] = stage_inputs(
+                config, CLIP_CONFIG_KEYS, moment=moment, source=artifact_hash(manifest, "download") if manifest else None, fillers=fillers
+            )
+            cached_clip = get_artifact(manifest, f"clip:{moment['video_title']}", clip_inputs[moment["video_title"]]) if manifest else None
+            if cached_clip:
+                print(f"♻️ Reusing rendered clip: {cached_clip}")
+                final_clips[moment["video_title"]] = cached_clip
+            else:
+                pending_moments.append(moment)
+
+        def on_clip_rendered(moment, output_video):
+            if manifest:
+                output_video = record_artifact(manifest, f"clip:{moment['video_title']}", output_video, clip_inputs[moment["video_title"]], move=True)
+            final_clips[moment["video_title"]] = output_video
+            return output_video
+
+        def render_pending():
+            """Voices, filler pool and rendering of the clips not in the cache. Returns False if trimming failed."""
+            if not pending_moments:
+                print("♻️ All clips already rendered.")
+                return True
+
+            # ✅ Step 3: Generate AI voice for each caption (if enabled)
+            caption_voices = generate_caption_voices(pending_moments, config, job_dir)
+            return render_clips(video_path, pending_moments, caption_voices, clip_transcripts_for(pending_moments), job_dir, config, on_clip_rendered)
+
+        async with stage_slot("render", limits, on_stage):
+            if not await asyncio.to_thread(render_pending):
+                return None
+
+        final_clips = [final_clips[moment["video_title"]] for moment in best_moments if moment["video_title"] in final_clips]
+
+        # Checkpointed clips stay in the source cache, so copy them out instead of moving
+        output_folder = "videos"
+        utils.save_final_videos(final_clips, output_folder=output_folder, copy=manifest is not None)
+
+        return [os.path.join(output_folder, os.path.basename(clip)) for clip in final_clips]
+    finally:
+        await stop_video_download(video_download, cancel_download)
+
+
+async def main(draft=False):
+    config = utils.load_config()
+
+    # Every job gets its own workspace so concurrent runs never clobber each other's files
+    job_dir = utils.create_workspace()
+    final_clips = await process_source(config["video_url"], job_dir, draft=draft)
+    if final_clips is None:
+        return
+
+    # Ensure closure and cleanup of temp files
+    utils.cleanup_temp_files(job_dir)
+    os.rmdir(job_dir)
+
+    if draft:
+        print(f"🎉 Drafts ready for review: {final_clips}")
+        print("👉 Render the keepers with: python main.py --finalize metadata/<clip>.json ...")
     else:
-        caption_voices = [None] * len(short_clips)
-        captions = [moment["caption"] for moment in best_moments]
+        print(f"🎉 Final processed videos: {final_clips}")
+
+
+def finalize(metadata_files):
+    """
+    Renders the approved drafts at full quality from the metadata `--draft` saved for them
+    (moment, source video and subtitles), without transcribing or asking the LLM again.
+    """
+    config = utils.load_config()
+    job_dir = utils.create_workspace()
+
+    # Group the moments by source so each source video is only located (or downloaded) once
+    sources = {}
+    for metadata_file in metadata_files:
+        moment, source, source_video, subtitles = load_draft_metadata(metadata_file)
+        if not source:
+            print(f"⚠️ Skipping {metadata_file}: not saved by a draft run.")
+            continue
+        sources.setdefault((source, source_video), []).append((moment, subtitles))
 
-    # ✅ Step 5: Format and Enhance Each Clip
     final_clips = []
-    for clip, voice, caption in zip(short_clips, caption_voices, captions):
-        output_video = f"{clip}"
-        process_video(clip, output_video, voice, caption)  # Apply formatting and effects
-        final_clips.append(output_video)
+    for (source, source_video), entries in sources.items():
+        video_path = source_video
+        if not video_path or not os.path.exists(video_path):
+            video_path = source if os.path.isfile(source) else utils.download_video(source, output_dir=job_dir)
+        if not video_path:
+            print(f"❌ Failed to download {source}.")
+            continue
 
-    save_final_videos(final_clips)
+        moments = [moment for moment, _ in entries]
+        caption_voices = generate_caption_voices(moments, config, job_dir)
+        render_clips(
+            video_path, moments, caption_voices, [subtitles for _, subtitles in entries], job_dir, config,
+            on_rendered=lambda moment, output_video: final_clips.append(output_video),
+        )
 
-    # Ensure closure and cleanup of temp files
-    cleanup_temp_files()
+    utils.save_final_videos(final_clips, output_folder="videos")
+    utils.cleanup_temp_files(job_dir)
+    os.rmdir(job_dir)
 
-    print(f"🎉 Final processed videos: {final_clips}")
+    print(f"🎉 Final processed videos: {[os.path.join('videos', os.path.basename(clip)) for clip in final_clips]}")
 
 # Run the main function within an asyncio event loop
 if __name__ == "__main__":
-    asyncio.run(main())
-     
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Find viral moments in a video and render them as short clips.")
+    parser.add_argument("--profile-startup", action="store_true", help="Report the cold import time of each pipeline module and exit.")
+    parser.add_argument("--draft", action="store_true", help="Render every moment as a low-resolution proxy plus a contact sheet, for review.")
+    parser.add_argument("--finalize", nargs="+", metavar="METADATA", help="Render the drafts saved in these metadata files at full quality.")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        from utils.startup_profiler import profile_startup
+        profile_startup()
+    else:
+        config = utils.load_config()
+        set_enabled(config.get("instrumentation", True))
+        try:
+            if args.finalize:
+                finalize(args.finalize)
+            else:
+                asyncio.run(main(draft=args.draft))
+        finally:
+            if config.get("instrumentation", True):
+                print_summary()
+                export_chrome_trace(config.get("trace_file", "trace.json"))
@@ -1,20 +1,45 @@
-from .config_loader import load_config
-from .youtube_downloader import download_video
-from .transcriber import transcribe_audio
-from .ai_processor import find_best_moments
-from .video_editor import trim_video, process_video
-from .file_utils import cleanup_temp_files, save_final_videos
-from .ai_voice_generator import generate_voice
+import importlib
+
+# Exported function -> submodule that defines it. Submodules (and the heavy libraries they use,
+# e.g. moviepy, faster_whisper, google.generativeai, yt_dlp, TTS) are only imported the first
+# time one of their functions is accessed.
+_EXPORTS = {
+    "load_config": "config_loader",
+    "download_video": "youtube_downloader",
+    "download_audio": "youtube_downloader",
+    "extract_pcm": "audio_pipeline",
+    "load_pcm": "audio_pipeline",
+    "transcribe_audio": "transcriber",
+    "stream_transcript": "transcriber",
+    "save_transcript": "transcriber",
+    "slice_transcript": "transcriber",
+    "find_best_moments": "ai_processor",
+    "find_best_moments_streaming": "ai_processor",
+    "trim_video": "video_editor",
+    "process_video": "video_editor",
+    "render_moments": "video_editor",
+    "cleanup_temp_files": "file_utils",
+    "create_workspace": "file_utils",
+    "save_final_videos": "file_utils",
+    "render_moments_parallel": "render_pool",
+    "generate_voice": "ai_voice_generator",
+    "generate_voices": "ai_voice_generator",
+    "generate_voices_background": "ai_voice_generator",
+    "resolve_voice": "ai_voice_generator",
+}
 
 # Define what is available when using `from utils import *`
-__all__ = [
-    "load_config",
-    "download_video",
-    "transcribe_audio",
-    "find_best_moments",
-    "trim_video",
-    "process_video",
-    "cleanup_temp_files",
-    "save_final_videos",
-    "generate_voice"
-]
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value  # Later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
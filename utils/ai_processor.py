@@ -1,41 +1,194 @@
-import time
+import asyncio
 import json
-import os
 import re
-import google.generativeai as genai
-from dotenv import load_dotenv
+from collections import Counter
+from contextlib import AsyncExitStack
 from utils.config_loader import load_config
+from utils.llm_scheduler import create_scheduler, count_tokens
+from utils.llm_cache import get_moments_cache, moments_cache_key
+from utils.moment_scoring import score_windows
+from utils.moment_validation import validate_moments
+from utils.audio_pipeline import SAMPLE_RATE
+from utils.instrumentation import instrument, increment
 
-# Load environment variables
-load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Bump whenever the prompt below changes so cached LLM replies are not reused
+PROMPT_TEMPLATE_VERSION = 3
 
-# Constants
-RPM_LIMIT = 2
-SECONDS_BETWEEN_CALLS = 60 / RPM_LIMIT  # 30 seconds for 2 RPM
+# Line sent in place of the transcript left out between two non-adjacent parts of a chunk
+GAP_MARKER = "[...]"
+# Seconds a moment may reach into a left-out part (LLM times are rounded to one decimal)
+GAP_TOLERANCE_SECONDS = 0.2
 
-def chunk_transcript(transcript_data, max_chunk_duration=600):
-    chunks = []
+def chunk_transcript(transcript_data, max_chunk_duration=600, max_chunk_tokens=None, overlap_seconds=0):
+    return [chunk for chunk, _ in iter_transcript_chunks(transcript_data, max_chunk_duration, max_chunk_tokens, overlap_seconds)]
+
+def iter_transcript_chunks(transcript_entries, max_chunk_duration=600, max_chunk_tokens=None, overlap_seconds=0):
+    """
+    Yields `(chunk, is_last)` as soon as each chunk is full, so a streaming transcript can be
+    sent to the LLM while the rest is still being transcribed.
+
+    A chunk is full when it reaches `max_chunk_duration` seconds of speech or, if set,
+    `max_chunk_tokens` tokens of compact transcript. Each new chunk starts with the entries from
+    the last `overlap_seconds` of the previous one, so moments crossing a boundary aren't lost.
+    """
     current_chunk = []
     current_duration = 0.0
+    current_tokens = 0
 
-    for entry in transcript_data:
+    for entry in transcript_entries:
         start = entry.get("start", 0.0)
         end = entry.get("end", 0.0)
         duration = end - start
+        tokens = count_tokens(format_transcript_line(entry)) if max_chunk_tokens else 0
+
+        fits = current_duration + duration <= max_chunk_duration
+        if max_chunk_tokens and current_tokens + tokens > max_chunk_tokens:
+            fits = False
 
-        if current_duration + duration <= max_chunk_duration:
+        if fits or not current_chunk:
             current_chunk.append(entry)
             current_duration += duration
-        else:
-            chunks.append(current_chunk)
-            current_chunk = [entry]
-            current_duration = duration
+            current_tokens += tokens
+            continue
+
+        yield current_chunk, False
+
+        # Carry the tail of the previous chunk over, at most half of it so chunks always advance
+        overlap = [e for e in current_chunk if e["end"] > current_chunk[-1]["end"] - overlap_seconds] if overlap_seconds else []
+        overlap = overlap[len(overlap) - min(len(overlap), len(current_chunk) // 2):]
+        current_chunk = overlap + [entry]
+        current_duration = sum(e["end"] - e["start"] for e in current_chunk)
+        current_tokens = sum(count_tokens(format_transcript_line(e)) for e in current_chunk) if max_chunk_tokens else 0
 
     if current_chunk:
-        chunks.append(current_chunk)
+        yield current_chunk, True
+
+def format_transcript_line(entry):
+    """Compact wire format of one transcript entry: `start-end text`, times in seconds with one decimal."""
+    return f"{entry['start']:.1f}-{entry['end']:.1f} {entry['text'].strip()}"
+
+def format_transcript_compact(chunk):
+    """Chunk in the wire format, with `GAP_MARKER` wherever transcript was left out (see `mark_gaps`)."""
+    lines = []
+    for entry in chunk:
+        if entry.get("gap_before") and lines:
+            lines.append(GAP_MARKER)
+        lines.append(format_transcript_line(entry))
+    return "\n".join(lines)
+
+def mark_gaps(chunk, transcript_data):
+    """
+    Copy of `chunk` where each entry that doesn't directly follow the previous one in
+    `transcript_data` has `"gap_before": True`, so the prompt shows the cut and moments across it
+    can be rejected (see `drop_moments_across_gaps`).
+    """
+    positions = {(entry["start"], entry["end"]): idx for idx, entry in enumerate(transcript_data)}
+    marked = []
+    previous = None
+    for entry in chunk:
+        entry = {key: value for key, value in entry.items() if key != "gap_before"}
+        position = positions.get((entry["start"], entry["end"]))
+        if marked and (position is None or previous is None or position != previous + 1):
+            entry["gap_before"] = True
+        marked.append(entry)
+        previous = position
+    return marked
+
+def drop_moments_across_gaps(moments, chunk):
+    """Moments that stay within one continuous part of `chunk`; the others span transcript the LLM never saw."""
+    gaps = [(chunk[idx - 1]["end"], chunk[idx]["start"]) for idx in range(1, len(chunk)) if chunk[idx].get("gap_before")]
+    if not gaps:
+        return moments
+
+    kept = []
+    for moment in moments:
+        try:
+            start, end = float(moment["start"]), float(moment["end"])
+        except (TypeError, ValueError):
+            kept.append(moment)  # Left for validate_moments to drop
+            continue
+        if any(start < gap_end - GAP_TOLERANCE_SECONDS and end > gap_start + GAP_TOLERANCE_SECONDS for gap_start, gap_end in gaps):
+            continue
+        kept.append(moment)
+
+    if len(kept) < len(moments):
+        print(f"🧹 Dropped {len(moments) - len(kept)} moments spanning left-out transcript.")
+    return kept
+
+def chunking_settings(config):
+    """Chunking options from config.json."""
+    return {
+        "max_chunk_duration": config.get("chunk_max_seconds", 600),
+        "max_chunk_tokens": config.get("chunk_max_tokens"),
+        "overlap_seconds": config.get("chunk_overlap_seconds", 0),
+    }
+
+def prescored_chunks(transcript_data, config, top_k, audio=None):
+    """
+    Transcript chunks covering the `top_k` best windows from `score_windows`, best windows first.
+
+    Each window is widened to at least `maximum_moment_time` so it can hold a full-length moment,
+    overlapping windows are merged, and the windows are packed into as few chunks as the
+    `chunk_max_seconds` / `chunk_max_tokens` budget allows, so fewer requests are sent. Where a
+    chunk jumps between windows its entries are marked with `mark_gaps`.
+    """
+    duration = transcript_data[-1]["end"] if transcript_data else 0
+    if audio is not None:
+        duration = max(duration, len(audio) / SAMPLE_RATE)
+
+    min_time = float(config["minimum_moment_time"])
+    max_time = float(config["maximum_moment_time"])
+    windows = score_windows(transcript_data, duration, min_time, max_time, top_k, samples=audio)
+
+    # Widen around the scored window, shifting it back inside the source at the edges
+    widened = []
+    for start, end, score in windows:
+        length = min(max(end - start, max_time), duration)
+        start = min(max(start - (length - (end - start)) / 2, 0.0), duration - length)
+        widened.append((start, start + length, score))
 
-    return chunks
+    # Merge windows that overlap after widening, keeping the best score of each group
+    merged = []
+    for start, end, score in sorted(widened):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end), max(merged[-1][2], score))
+        else:
+            merged.append((start, end, score))
+
+    settings = chunking_settings(config)
+    max_chunk_tokens = settings["max_chunk_tokens"]
+    chunks = []
+    current, current_duration, current_tokens = [], 0.0, 0
+
+    for start, end, _ in sorted(merged, key=lambda window: -window[2]):
+        entries = [entry for entry in transcript_data if entry["end"] > start and entry["start"] < end]
+        if not entries:
+            continue
+        tokens = count_tokens(format_transcript_compact(entries)) if max_chunk_tokens else 0
+
+        fits = current_duration + (end - start) <= settings["max_chunk_duration"]
+        if max_chunk_tokens and current_tokens + tokens > max_chunk_tokens:
+            fits = False
+
+        if current and not fits:
+            chunks.append(current)
+            current, current_duration, current_tokens = [], 0.0, 0
+
+        if not current and (end - start > settings["max_chunk_duration"] or (max_chunk_tokens and tokens > max_chunk_tokens)):
+            # A merged window too big for one request is split like a regular transcript
+            chunks.extend(chunk_transcript(entries, **settings))
+            continue
+
+        current += entries
+        current_duration += end - start
+        current_tokens += tokens
+
+    if current:
+        chunks.append(current)
+
+    # Neighbouring windows can share an entry; each is sent once, in transcript order
+    chunks = [sorted({(entry["start"], entry["end"]): entry for entry in chunk}.values(), key=lambda entry: entry["start"]) for chunk in chunks]
+    return [mark_gaps(chunk, transcript_data) for chunk in chunks]
 
 def distribute_moments(num_moments, num_chunks):
     base = num_moments // num_chunks
@@ -48,11 +201,11 @@ def fix_json_formatting(raw_text):
         cleaned_text = f"[{cleaned_text}]"
     return cleaned_text
 
-def extract_viral_moments_from_chunk(chunk, num_moments, min_time, max_time):
-    formatted_transcript = json.dumps(chunk, indent=2)
+def build_moments_prompt(chunk, num_moments, min_time, max_time):
+    formatted_transcript = format_transcript_compact(chunk)
 
     prompt = f"""
-    You will receive a JSON transcript of a video.
+    You will receive a transcript of a video, one entry per line as `start-end text` (times in seconds).
 
     ### Task:
     Extract {num_moments} **viral moments** that are either **funny, shocking, or informative**.  
@@ -62,6 +215,7 @@ def extract_viral_moments_from_chunk(chunk, num_moments, min_time, max_time):
     - ✅ **Use only the provided timestamps** (Do NOT invent new timestamps).  
     - ✅ **Each extracted moment must consist of multiple transcript entries** to form a coherent {min_time}-{max_time} second segment.
     - ✅ **Ensure logical continuity**—the moment must make sense when viewed as a clip.
+    - ✅ **A `{GAP_MARKER}` line marks a part of the video left out of this transcript**: never select a moment that spans one.
     - ✅ **Include the transcript excerpt** from the selected segment for reference.
     - ✅ **Ensure all video titles generated are unique.
     - ✅ **Return only valid JSON**, formatted like this:
@@ -78,54 +232,265 @@ def extract_viral_moments_from_chunk(chunk, num_moments, min_time, max_time):
     ]
     ```
 
-    ### Transcript JSON:  
-    ```json
-    {formatted_transcript}
+    ### Transcript:
+    ```
+{formatted_transcript}
     ```
     """
 
+    return prompt
+
+def parse_moments_response(raw_text):
+    """Parses the LLM reply into a list of moments, or [] if it doesn't have the expected structure."""
+    fixed_text = fix_json_formatting(raw_text.strip())
+    json_data = json.loads(fixed_text)
+
+    if isinstance(json_data, list) and all(
+        isinstance(item, dict) and 
+        "start" in item and "end" in item and 
+        "transcript" in item and "caption" in item and "video_title" in item
+        for item in json_data
+    ):
+        return json_data
+    else:
+        print("❌ Skipping: Invalid structure returned.")
+        return []
+
+async def extract_viral_moments_from_chunk(scheduler, chunk, num_moments, min_time, max_time, cache=None, model_name=None, cache_counts=None):
+    """Moments the LLM finds in `chunk`. Cache hits and misses are also counted in `cache_counts` (a Counter) for this run."""
+    cache_key = None
+    if cache is not None:
+        cache_key = moments_cache_key(chunk, model_name, PROMPT_TEMPLATE_VERSION, num_moments, min_time, max_time)
+        cached_moments = cache.get(cache_key)
+        outcome = "hits" if cached_moments is not None else "misses"
+        increment(f"llm_cache_{outcome}")
+        if cache_counts is not None:
+            cache_counts[outcome] += 1
+        if cached_moments is not None:
+            print("♻️ Reusing cached moments for chunk.")
+            return cached_moments
+
+    prompt = build_moments_prompt(chunk, num_moments, min_time, max_time)
+
     try:
-        response = genai.GenerativeModel("gemini-1.5-pro").generate_content(prompt)
-        raw_text = response.text.strip()
-        fixed_text = fix_json_formatting(raw_text)
-        json_data = json.loads(fixed_text)
-
-        if isinstance(json_data, list) and all(
-            isinstance(item, dict) and 
-            "start" in item and "end" in item and 
-            "transcript" in item and "caption" in item and "video_title" in item
-            for item in json_data
-        ):
-            return json_data
-        else:
-            print("❌ Skipping: Invalid structure returned.")
-            return []
+        raw_text = await scheduler.generate(prompt)
+        moments = drop_moments_across_gaps(parse_moments_response(raw_text), chunk)
+
+        # Only cache usable replies so a bad response is retried on the next run
+        if cache_key and moments:
+            cache.set(cache_key, moments)
+
+        return moments
 
     except Exception as e:
         print(f"❌ Error processing chunk: {e}")
         return []
 
-def find_best_moments(transcript_data):
+@instrument()
+async def find_best_moments(transcript_data, client=None, audio=None):
+    """
+    Sends every transcript chunk to the LLM concurrently, paced by the RPM/TPM token buckets
+    configured in config.json instead of a fixed sleep between calls.
+
+    With `prescore_top_k` set, only the best candidate windows found by the local NumPy
+    pre-scoring are sent, widened to full moment length and packed into as few chunks as possible.
+
+    `client` replaces the Gemini client (any object with `generate(prompt) -> str`).
+    `audio` is the optional 16 kHz mono PCM of the source, used for audio features when pre-scoring.
+    """
     config = load_config()
     number_of_viral_moments = config["number_of_viral_moments"]
     minimum_moment_time = config["minimum_moment_time"]
     maximum_moment_time = config["maximum_moment_time"]
 
-    chunks = chunk_transcript(transcript_data)
-    print(f"🔹 Transcript split into {len(chunks)} chunks.")
+    top_k = config.get("prescore_top_k", 0)
+    if top_k:
+        chunks = prescored_chunks(transcript_data, config, top_k, audio)
+        print(f"🔹 Pre-scored windows packed into {len(chunks)} chunks.")
+    else:
+        chunks = chunk_transcript(transcript_data, **chunking_settings(config))
+        print(f"🔹 Transcript split into {len(chunks)} chunks.")
+
+    if not chunks:
+        return []
 
     distribution = distribute_moments(number_of_viral_moments, len(chunks))
+    scheduler = create_scheduler(config, client)
+    model_name = getattr(scheduler.client, "model_name", type(scheduler.client).__name__)
+    cache = get_moments_cache(config)
+    cache_counts = Counter()
 
-    all_moments = []
+    tasks = []
     for idx, (chunk, num_moments) in enumerate(zip(chunks, distribution)):
-        print(f"🔸 Processing chunk {idx+1}/{len(chunks)} with {num_moments} moments...")
+        if num_moments == 0:
+            continue
+        print(f"🔸 Queuing chunk {idx+1}/{len(chunks)} with {num_moments} moments...")
+        tasks.append(extract_viral_moments_from_chunk(
+            scheduler, chunk, num_moments, minimum_moment_time, maximum_moment_time, cache=cache, model_name=model_name, cache_counts=cache_counts
+        ))
 
-        moments = extract_viral_moments_from_chunk(chunk, num_moments, minimum_moment_time, maximum_moment_time)
+    # Results keep chunk order
+    all_moments = []
+    for moments in await asyncio.gather(*tasks):
         all_moments.extend(moments)
 
-        if idx < len(chunks) - 1:
-            print(f"⏳ Sleeping {SECONDS_BETWEEN_CALLS} seconds to respect RPM...")
-            time.sleep(SECONDS_BETWEEN_CALLS)
+    all_moments = await finalize_moments(all_moments, chunks, transcript_data, config, scheduler, cache, model_name, cache_counts)
 
+    print_cache_counts(cache, cache_counts)
     print(f"✅ Final viral moments count: {len(all_moments)}")
     return all_moments
+
+def print_cache_counts(cache, cache_counts):
+    """Reports this run's LLM cache hits and misses (the cache's own statistics span every run)."""
+    if cache is not None:
+        print(f"📊 LLM cache: {cache_counts['hits']} hits, {cache_counts['misses']} misses")
+
+async def finalize_moments(all_moments, chunks, transcript_data, config, scheduler, cache=None, model_name=None, cache_counts=None):
+    """
+    Validates the raw moments (see `validate_moments`) and, while fewer than `number_of_viral_moments`
+    are left, asks the chunks with the most time not yet covered for the missing ones, for up to
+    `moment_topup_rounds` rounds. Returns the moments sorted by start.
+    """
+    number_of_viral_moments = config["number_of_viral_moments"]
+    minimum_moment_time = config["minimum_moment_time"]
+    maximum_moment_time = config["maximum_moment_time"]
+
+    kept = validate_moments(all_moments, transcript_data, config)
+
+    for _ in range(config.get("moment_topup_rounds", 1)):
+        missing = number_of_viral_moments - len(kept)
+        if missing <= 0:
+            break
+
+        # Only offer the LLM the entries no kept moment covers yet, marking where covered ones were cut out
+        free_chunks = [
+            mark_gaps([entry for entry in chunk if not kept.overlaps(entry["start"], entry["end"])], transcript_data)
+            for chunk in chunks
+        ]
+        free_chunks = [
+            chunk for chunk in free_chunks
+            if chunk and chunk[-1]["end"] - chunk[0]["start"] >= float(minimum_moment_time)
+        ]
+        if not free_chunks:
+            break
+
+        free_chunks = sorted(free_chunks, key=lambda chunk: -kept.free_time(chunk[0]["start"], chunk[-1]["end"]))[:missing]
+        print(f"🔁 Topping up {missing} moments from {len(free_chunks)} chunks...")
+        tasks = [
+            extract_viral_moments_from_chunk(
+                scheduler, chunk, num_moments, minimum_moment_time, maximum_moment_time, cache=cache, model_name=model_name, cache_counts=cache_counts
+            )
+            for chunk, num_moments in zip(free_chunks, distribute_moments(missing, len(free_chunks)))
+        ]
+
+        found = len(kept)
+        for moments in await asyncio.gather(*tasks):
+            validate_moments(moments, transcript_data, config, kept=kept)
+        if len(kept) == found:
+            break
+
+    return kept.moments
+
+@instrument()
+async def find_best_moments_streaming(transcript_entries, total_duration, client=None, on_transcribed=None, llm_slot=None):
+    """
+    Streaming version of `find_best_moments`: consumes transcript entries while they are being
+    transcribed (e.g. from `stream_transcript`) and sends each chunk to the LLM as soon as it is
+    full, so ASR and LLM latency overlap.
+
+    Moments are shared out by how far into the source each chunk ends, since the number of chunks
+    isn't known up front; the last chunk takes whatever is left.
+
+    Returns `(moments, transcript_data)`, the latter being every entry that was consumed.
+
+    `llm_slot` is an async context manager held around the LLM requests (entered once the first
+    chunk is ready), and `on_transcribed` an async callback awaited as soon as ASR has finished,
+    e.g. to hand the transcription slot to the next job while the last requests are in flight.
+
+    `prescore_top_k` doesn't apply here: ranking windows needs the whole transcript, which only
+    exists once ASR is done, so main.py doesn't stream when it is set.
+    """
+    config = load_config()
+    number_of_viral_moments = config["number_of_viral_moments"]
+    minimum_moment_time = config["minimum_moment_time"]
+    maximum_moment_time = config["maximum_moment_time"]
+
+    scheduler = create_scheduler(config, client)
+    model_name = getattr(scheduler.client, "model_name", type(scheduler.client).__name__)
+    cache = get_moments_cache(config)
+    cache_counts = Counter()
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    transcript_data = []
+
+    def collect(entries):
+        for entry in entries:
+            transcript_data.append(entry)
+            yield entry
+
+    # Whisper is blocking, so run it (and the chunking) on a worker thread and hand chunks back to the loop
+    def produce():
+        try:
+            for chunk in iter_transcript_chunks(collect(transcript_entries), **chunking_settings(config)):
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    producer = asyncio.ensure_future(asyncio.to_thread(produce))
+
+    llm_stack = AsyncExitStack()
+    llm_entry = None
+
+    async def extract(chunk, num_moments):
+        await llm_entry
+        return await extract_viral_moments_from_chunk(
+            scheduler, chunk, num_moments, minimum_moment_time, maximum_moment_time, cache=cache, model_name=model_name, cache_counts=cache_counts
+        )
+
+    tasks = []
+    chunks = []
+    assigned = 0
+    while (item := await queue.get()) is not None:
+        chunk, is_last = item
+        chunks.append(chunk)
+        if is_last:
+            num_moments = number_of_viral_moments - assigned
+        else:
+            target = min(number_of_viral_moments, round(number_of_viral_moments * chunk[-1]["end"] / total_duration))
+            num_moments = target - assigned
+
+        if num_moments <= 0:
+            continue
+
+        if llm_entry is None:
+            # Don't block the consumer while waiting for the slot, chunks keep queuing behind it
+            llm_entry = asyncio.ensure_future(llm_stack.enter_async_context(llm_slot) if llm_slot else asyncio.sleep(0))
+
+        assigned += num_moments
+        print(f"🔸 Chunk {len(tasks)+1} ready (up to {chunk[-1]['end']:.0f}s), queuing {num_moments} moments...")
+        tasks.append(asyncio.ensure_future(extract(chunk, num_moments)))
+
+    async with llm_stack:
+        try:
+            await producer  # Re-raises transcription errors
+            if on_transcribed:
+                await on_transcribed()
+
+            all_moments = []
+            for moments in await asyncio.gather(*tasks):
+                all_moments.extend(moments)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            if llm_entry is not None:
+                llm_entry.cancel()
+            raise
+
+        if llm_entry is None and llm_slot:
+            await llm_stack.enter_async_context(llm_slot)  # No chunk needed moments, the top-up still calls the LLM
+        all_moments = await finalize_moments(all_moments, chunks, transcript_data, config, scheduler, cache, model_name, cache_counts)
+    print_cache_counts(cache, cache_counts)
+
+    print(f"✅ Final viral moments count: {len(all_moments)}")
+    return all_moments, transcript_data
@@ -1,18 +1,96 @@
-from TTS.api import TTS
+import hashlib
+import os
 import re
-# Initialize the TTS model for CPU
-tts = TTS(model_name="tts_models/en/ljspeech/tacotron2-DDC", gpu=False)
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils.config_loader import load_config
+from utils.model_registry import get_model
+from utils.instrumentation import instrument, increment
 
+DEFAULT_TTS_MODEL = "tts_models/en/ljspeech/tacotron2-DDC"
 
-def generate_voice(text, videoTitle):
+# The TTS engine isn't thread-safe and is shared by every job in the process, so synthesis is serialized
+_tts_lock = threading.Lock()
+# Its worker thread only starts with the first background synthesis
+_tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+
+
+def get_tts(config):
+    """Returns the warm TTS engine, importing Coqui TTS and loading the model only on first use."""
+    model_name = config.get("tts_model", DEFAULT_TTS_MODEL)
+
+    def load():
+        from TTS.api import TTS
+        # Initialize the TTS model for CPU
+        return TTS(model_name=model_name, gpu=False)
+
+    return get_model(
+        ("tts", model_name),
+        load,
+        size_mb=config.get("tts_model_size_mb", 400),
+        max_total_mb=config.get("model_cache_max_mb"),
+        idle_seconds=config.get("model_idle_seconds"),
+    )
+
+
+def normalize_caption(text):
     # Remove emojis and special characters
     text = re.sub(r'[^\w\s.,!?\'\"]', '', text)
+    return " ".join(text.split())
+
+
+def voice_cache_path(text, config):
+    """Cached synthesis of `text` for the configured voice model, or None if the cache is disabled."""
+    cache_dir = config.get("tts_cache_dir")
+    if not cache_dir:
+        return None
+
+    model_name = config.get("tts_model", DEFAULT_TTS_MODEL)
+    key = hashlib.sha256(f"{model_name}\n{text}".encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{key}.wav")
+
+
+@instrument()
+def generate_voice(text, videoTitle, output_dir="temp"):
+    config = load_config()
+    text = normalize_caption(text)
+    output_path = f"{output_dir}/{videoTitle}.wav"
+
+    # Reuse an earlier synthesis of the same text and voice
+    cache_path = voice_cache_path(text, config)
+    if cache_path and os.path.exists(cache_path):
+        shutil.copy2(cache_path, output_path)
+        print(f"♻️ Reusing cached voice for '{videoTitle}'")
+        increment("tts_cache_hits")
+        return output_path
 
     # Generate speech and save to a file
-    output_path = f"temp/{videoTitle}.wav"
-    tts.tts_to_file(text=text, file_path=output_path)
+    with _tts_lock:
+        get_tts(config).tts_to_file(text=text, file_path=output_path)
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        shutil.copy2(output_path, cache_path)
 
     print(f"Audio saved to {output_path}")
     return output_path
 
 
+def generate_voices(captions, video_titles, output_dir="temp"):
+    """Synthesizes every caption of a job with one warm engine; returns the audio paths in order."""
+    return [generate_voice(caption, title, output_dir) for caption, title in zip(captions, video_titles)]
+
+
+def generate_voices_background(captions, video_titles, output_dir="temp"):
+    """
+    Starts synthesizing the captions on a background thread and returns one Future per caption,
+    so rendering can begin as soon as the first voice is ready. Every job queues on the same
+    single thread, since the TTS engine isn't thread-safe.
+    """
+    return [_tts_executor.submit(generate_voice, caption, title, output_dir) for caption, title in zip(captions, video_titles)]
+
+
+def resolve_voice(voice):
+    """Waits for a voice started with `generate_voices_background`; plain paths and None pass through."""
+    return voice.result() if isinstance(voice, Future) else voice
@@ -0,0 +1,125 @@
+import os
+from PIL import ImageColor, ImageFont
+from utils.smart_cut import run_ffmpeg
+from utils.subtitle_renderer import FONT_SIZE as SUBTITLE_FONT_SIZE, CAPTION_FONT_SIZE, SUBTITLE_MARGIN
+
+
+def ass_color(color):
+    """Any Pillow color name or hex code as an ASS `&HAABBGGRR` color."""
+    red, green, blue = ImageColor.getrgb(color)[:3]
+    return f"&H00{blue:02X}{green:02X}{red:02X}"
+
+
+def ass_timestamp(seconds):
+    centiseconds = int(round(max(seconds, 0) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+
+def ass_text(text):
+    # Braces start override blocks in ASS
+    return text.replace("{", "(").replace("}", ")").replace("\n", "\\N")
+
+
+def font_family(font_path):
+    """Family name libass matches the font by (the file itself is found through `fontsdir`)."""
+    return ImageFont.truetype(font_path, SUBTITLE_FONT_SIZE).getname()[0]
+
+
+def karaoke_text(entry):
+    """
+    Entry text with a `\\k` tag before every word, so each word switches to the highlight color as it
+    is spoken. Uses the entry's word timestamps when it has them, otherwise spreads its duration evenly.
+    """
+    words = entry.get("words")
+    if not words:
+        texts = entry["text"].split()
+        step = (entry["end"] - entry["start"]) / max(len(texts), 1)
+        words = [{"word": word, "start": entry["start"] + idx * step, "end": entry["start"] + (idx + 1) * step}
+                 for idx, word in enumerate(texts)]
+
+    parts = []
+    cursor = entry["start"]
+    for word in words:
+        # Gaps before a word are folded into its duration so the highlight stays in sync
+        duration = max(int(round((word["end"] - cursor) * 100)), 0)
+        parts.append(f"{{\\k{duration}}}{ass_text(word['word'].strip())}")
+        cursor = word["end"]
+    return " ".join(parts)
+
+
+def build_ass(frame_size, config, transcript=None, caption=None, caption_duration=0):
+    """
+    ASS script for a clip: one "Subtitle" event per transcript entry (top edge at the middle of the
+    frame, like the other backends) and optionally the caption intro text centered over the first
+    `caption_duration` seconds. Font, colors, outline and shadow come from config.json.
+    """
+    width, height = frame_size
+    family = font_family(config["font_path"])
+    color = ass_color(config["subtitle_color"])
+    highlight = ass_color(config.get("subtitle_highlight_color", "yellow"))
+    outline = config.get("subtitle_outline_width", 2)
+    shadow = config.get("subtitle_shadow", 2)
+    karaoke = config.get("subtitle_karaoke", False)
+
+    # With karaoke, words start in SecondaryColour and turn PrimaryColour once spoken
+    primary, secondary = (highlight, color) if karaoke else (color, color)
+    caption_margin = int(width * 0.05)
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+        "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding",
+        f"Style: Subtitle,{family},{SUBTITLE_FONT_SIZE},{primary},{secondary},&H00000000,&H00000000,0,0,0,0,"
+        f"100,100,0,0,1,{outline},{shadow},8,{SUBTITLE_MARGIN},{SUBTITLE_MARGIN},{height // 2},1",
+        f"Style: Caption,{family},{CAPTION_FONT_SIZE},{color},{color},&H00000000,&H00000000,0,0,0,0,"
+        f"100,100,0,0,1,{outline},0,5,{caption_margin},{caption_margin},0,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+
+    if caption and caption_duration:
+        lines.append(f"Dialogue: 1,{ass_timestamp(0)},{ass_timestamp(caption_duration)},Caption,,0,0,0,,{ass_text(caption)}")
+
+    for entry in transcript or []:
+        text = karaoke_text(entry) if karaoke else ass_text(entry["text"])
+        lines.append(f"Dialogue: 0,{ass_timestamp(entry['start'])},{ass_timestamp(entry['end'])},Subtitle,,0,0,0,,{text}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_ass_file(output_file, frame_size, config, transcript=None, caption=None, caption_duration=0):
+    with open(output_file, "w", encoding="utf-8") as file:
+        file.write(build_ass(frame_size, config, transcript, caption, caption_duration))
+    return output_file
+
+
+def filter_path(path):
+    # Inside a quoted filter option only ':' still needs escaping (e.g. Windows drive letters)
+    return os.path.abspath(path).replace("\\", "/").replace(":", "\\:")
+
+
+def ass_filter(ass_file, config):
+    """ffmpeg `ass` filter burning `ass_file` in, with the configured font's folder as its font directory."""
+    fonts_dir = os.path.dirname(os.path.abspath(config["font_path"]))
+    return f"ass=filename='{filter_path(ass_file)}':fontsdir='{filter_path(fonts_dir)}'"
+
+
+def burn_subtitles(input_video, ass_file, output_video, config, threads=None):
+    """Re-encodes `input_video` with the ASS subtitles rendered by libass inside the ffmpeg encode."""
+    args = ["-i", input_video, "-vf", ass_filter(ass_file, config), "-c:v", "libx264", "-c:a", "copy"]
+    if threads:
+        args += ["-threads", str(threads)]
+    run_ffmpeg(args + [output_video])
+    return output_video
@@ -0,0 +1,30 @@
+import subprocess
+import numpy as np
+
+# faster-whisper (and any later audio analysis) works on 16 kHz mono float32
+SAMPLE_RATE = 16000
+
+
+def extract_pcm(media_path, output_file, sample_rate=SAMPLE_RATE):
+    """
+    Demuxes only the audio track of `media_path` and resamples it once to mono float32 PCM,
+    written as a raw little-endian file that `load_pcm` can memory-map.
+    """
+    from moviepy.config import get_setting
+
+    print(f"🔊 Extracting {sample_rate} Hz mono PCM from {media_path}...")
+    subprocess.run(
+        [get_setting("FFMPEG_BINARY"), "-y", "-v", "error", "-i", media_path,
+         "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "-acodec", "pcm_f32le", output_file],
+        check=True, capture_output=True,
+    )
+    return output_file
+
+
+def load_pcm(pcm_file):
+    """Read-only memory map of a raw float32 PCM file; pages are only read from disk when used."""
+    return np.memmap(pcm_file, dtype=np.float32, mode="r")
+
+
+def pcm_duration(samples, sample_rate=SAMPLE_RATE):
+    return len(samples) / sample_rate
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from utils.instrumentation import increment
+
+MANIFEST_FILE = "manifest.json"
+
+# config.json settings each stage's output depends on; changing one makes that stage stale
+WORDS_CONFIG_KEYS = ["whisper_model_size", "whisper_compute_type"]
+TRANSCRIPT_CONFIG_KEYS = ["max_words_per_segment", "whisper_model_size", "whisper_compute_type"]
+MOMENTS_CONFIG_KEYS = [
+    "number_of_viral_moments", "minimum_moment_time", "maximum_moment_time", "llm_model",
+    "chunk_max_seconds", "chunk_max_tokens", "chunk_overlap_seconds", "prescore_top_k",
+    "moment_snap_seconds", "moment_topup_rounds",
+]
+CLIP_CONFIG_KEYS = ["video_type", "font_path", "subtitle_color", "add_subtitles", "add_caption_voice", "fused_render",
+    "subtitle_backend", "subtitle_karaoke", "subtitle_highlight_color", "subtitle_outline_width", "subtitle_shadow", "caption_intro_mode",
+    "tts_model",
+]
+
+
+def get_video_id(video_url):
+    """YouTube video ID of `video_url`, or a short hash of it for other sources."""
+    match = re.search(r"(?:v=|youtu\.be/|shorts/)([\w-]{11})", video_url)
+    if match:
+        return match.group(1)
+    return hashlib.sha256(video_url.encode("utf-8")).hexdigest()[:16]
+
+
+def file_digest(path):
+    """SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def inputs_digest(inputs):
+    """SHA-256 of any JSON-serializable description of a stage's inputs."""
+    payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def open_manifest(video_url, cache_dir="cache/sources"):
+    """
+    Loads (or starts) the stage manifest of a source video.
+
+    The manifest lives in `<cache_dir>/<video_id>/manifest.json` and records every artifact
+    produced for that source (download, transcript, moments and rendered clips) with its
+    content hash and a hash of the inputs it was produced from.
+    """
+    source_dir = os.path.join(cache_dir, get_video_id(video_url))
+    os.makedirs(source_dir, exist_ok=True)
+
+    manifest_path = os.path.join(source_dir, MANIFEST_FILE)
+    manifest = {"video_url": video_url, "artifacts": {}}
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except json.JSONDecodeError:
+            print(f"⚠️ Ignoring corrupt manifest {manifest_path}")
+
+    manifest["dir"] = source_dir
+    save_manifest(manifest)  # Marks the source as recently used for eviction
+    return manifest
+
+
+def save_manifest(manifest):
+    manifest["updated_at"] = time.time()
+    manifest_path = os.path.join(manifest["dir"], MANIFEST_FILE)
+
+    # Write then rename so a crash never leaves a half-written manifest
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=4, ensure_ascii=False)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def get_artifact(manifest, name, inputs=None):
+    """
+    Returns the path of artifact `name` if it exists, its content is unchanged and it was built
+    from the same `inputs`; otherwise None (the stage must run again).
+    """
+    entry = manifest["artifacts"].get(name)
+    if entry is None or not os.path.exists(entry["path"]):
+        return None
+
+    if inputs is not None and entry.get("inputs") != inputs_digest(inputs):
+        return None
+
+    # Only re-hash the file when its size or mtime changed since it was recorded
+    stat = os.stat(entry["path"])
+    if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+        if file_digest(entry["path"]) != entry["sha256"]:
+            return None
+
+    increment("checkpoint_hits")
+    return entry["path"]
+
+
+def record_artifact(manifest, name, path, inputs=None, move=False):
+    """
+    Records `path` as artifact `name` and saves the manifest. With `move=True` the file is first
+    moved into the source's cache folder. Returns the recorded path.
+    """
+    if move:
+        destination = os.path.join(manifest["dir"], os.path.basename(path))
+        shutil.move(path, destination)
+        path = destination
+
+    stat = os.stat(path)
+    manifest["artifacts"][name] = {
+        "path": path,
+        "sha256": file_digest(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "inputs": inputs_digest(inputs) if inputs is not None else None,
+    }
+    save_manifest(manifest)
+    return path
+
+
+def stage_inputs(config, keys, **upstream):
+    """Inputs of a stage: the config settings it depends on plus the hashes/data of upstream artifacts."""
+    inputs = {key: config.get(key) for key in keys}
+    inputs.update(upstream)
+    return inputs
+
+
+def artifact_hash(manifest, name):
+    """Content hash of a recorded artifact, used to chain it into the inputs of later stages."""
+    entry = manifest["artifacts"].get(name)
+    return entry["sha256"] if entry else None
+
+
+def load_json_artifact(manifest, name, inputs=None):
+    """Loads a JSON artifact (transcript, moments) if it is still valid, else None."""
+    path = get_artifact(manifest, name, inputs)
+    if path is None:
+        return None
+
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_json_artifact(manifest, name, data, inputs=None):
+    """Writes `data` to `<name>.json` in the source's cache folder and records it."""
+    path = os.path.join(manifest["dir"], f"{name}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=4, ensure_ascii=False)
+    return record_artifact(manifest, name, path, inputs)
+
+
+def folder_size(folder):
+    return sum(
+        os.path.getsize(os.path.join(root, file))
+        for root, _, files in os.walk(folder)
+        for file in files
+    )
+
+
+def evict_source_cache(cache_dir="cache/sources", max_age_days=None, max_total_mb=None, keep=None):
+    """
+    Deletes cached sources not used for `max_age_days`, then the least recently used ones
+    until the whole cache fits in `max_total_mb`. The source folder `keep` is never deleted.
+    """
+    if not os.path.exists(cache_dir):
+        return
+
+    sources = []
+    for video_id in os.listdir(cache_dir):
+        if video_id == keep:
+            continue
+        source_dir = os.path.join(cache_dir, video_id)
+        manifest_path = os.path.join(source_dir, MANIFEST_FILE)
+        last_used = os.path.getmtime(manifest_path) if os.path.exists(manifest_path) else os.path.getmtime(source_dir)
+        sources.append([last_used, folder_size(source_dir), source_dir])
+
+    sources.sort()  # Oldest first
+    now = time.time()
+
+    if max_age_days:
+        for source in [s for s in sources if now - s[0] > max_age_days * 86400]:
+            print(f"🧹 Evicting stale source cache {source[2]}")
+            shutil.rmtree(source[2])
+            sources.remove(source)
+
+    if max_total_mb:
+        total_size = sum(source[1] for source in sources)
+        while sources and total_size > max_total_mb * 1024 * 1024:
+            _, size, source_dir = sources.pop(0)
+            print(f"🧹 Evicting source cache {source_dir} to stay under {max_total_mb} MB")
+            shutil.rmtree(source_dir)
+            total_size -= size
@@ -0,0 +1,179 @@
+import json
+import os
+from datetime import datetime
+from PIL import Image, ImageDraw
+from constants import FORMAT_ONE, FORMAT_TWO
+from utils.ass_subtitles import write_ass_file, ass_filter
+from utils.config_loader import load_config
+from utils.file_utils import save_clip_metadata
+from utils.filler_pool import prepare_filler_pool, pick_filler
+from utils.instrumentation import instrument, span
+from utils.smart_cut import run_ffmpeg
+from utils.subtitle_renderer import load_font
+
+# Proxies are a third of the final 1080x1920 reel, encoded as cheaply as libx264 allows
+DRAFT_WIDTH = 360
+DRAFT_HEIGHT = 640
+DRAFT_FPS = 30
+DRAFT_CRF = 30
+# The caption text is shown this long at the start of a draft (finals time it to the AI voice)
+DRAFT_CAPTION_SECONDS = 3
+
+# The subtitles and captions are laid out on the final canvas; libass scales them to the proxy
+FINAL_SIZE = (1080, 1920)
+
+THUMBNAIL_WIDTH = 180
+THUMBNAIL_HEIGHT = 320
+SHEET_COLUMNS = 5
+LABEL_HEIGHT = 56
+LABEL_FONT_SIZE = 16
+
+# Keys the draft adds to the moment metadata so `finalize` can render it later
+DRAFT_KEYS = ("source", "source_video", "subtitles", "draft")
+
+
+def layout_filter(video_type):
+    """
+    filtergraph laying input 0 (and the filler, input 1, for format two) out like
+    `layout_format_one` / `layout_format_two`, at proxy size. Its output is labelled [layout].
+    """
+    if video_type == FORMAT_ONE:
+        # Landscape sources keep their aspect ratio at full width, others are squared, then centered on black
+        return (
+            f"[0:v]scale={DRAFT_WIDTH}:'if(gt(iw,ih),trunc({DRAFT_WIDTH}*ih/iw/2)*2,{DRAFT_WIDTH})',"
+            f"pad={DRAFT_WIDTH}:{DRAFT_HEIGHT}:0:(oh-ih)/2:black[layout]"
+        )
+    elif video_type == FORMAT_TWO:
+        half = DRAFT_HEIGHT // 2
+        return (
+            f"[0:v]scale={DRAFT_WIDTH}:{half}:force_original_aspect_ratio=increase,crop={DRAFT_WIDTH}:{half}[top];"
+            f"[1:v]scale={DRAFT_WIDTH}:{half}[bottom];"
+            f"[top][bottom]vstack[layout]"
+        )
+    raise ValueError(f"Unknown video_type: {video_type}")
+
+
+@instrument()
+def render_draft(video_path, moment, output_video, transcript=None, threads=None, filler_pool=None):
+    """
+    Renders a low-resolution proxy of one moment with a single ffmpeg run: seek, reel layout,
+    subtitles and caption text burned in by libass, ultrafast encode. No frames pass through
+    Python and no AI voice is synthesized, so drafts of every moment are cheap to review.
+    `filler_pool` is the prepared filler pool for format two (prepared here if not given).
+    """
+    config = load_config()
+    start = float(moment["start"])
+    duration = float(moment["end"]) - start
+
+    inputs = ["-ss", str(start), "-t", str(duration), "-i", video_path]
+    if config["video_type"] == FORMAT_TWO:
+        filler = pick_filler(filler_pool if filler_pool is not None else prepare_filler_pool(config), duration)
+        inputs += ["-t", str(duration), "-i", filler["path"]]
+
+    graph = layout_filter(config["video_type"])
+    ass_file = write_ass_file(
+        os.path.splitext(output_video)[0] + ".ass", FINAL_SIZE, config,
+        transcript if config["add_subtitles"] else None, moment["caption"], min(DRAFT_CAPTION_SECONDS, duration),
+    )
+    graph += f";[layout]{ass_filter(ass_file, config)}[out]"
+
+    args = inputs + [
+        "-filter_complex", graph, "-map", "[out]", "-map", "0:a?", "-t", str(duration), "-r", str(DRAFT_FPS),
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", str(DRAFT_CRF), "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "96k",
+    ]
+    if threads:
+        args += ["-threads", str(threads)]
+
+    print(f"📝 Drafting {output_video}: {moment['caption']} ({moment['start']} - {moment['end']})")
+    with span("render_draft", output=output_video, frames=int(duration * DRAFT_FPS)):
+        run_ffmpeg(args + [output_video])
+    os.remove(ass_file)
+    return output_video
+
+
+def extract_thumbnail(video_path, output_file, at=None):
+    """Grabs the frame at `at` seconds (the first one by default) as a thumbnail-sized JPEG."""
+    args = ["-i", video_path, "-frames:v", "1", "-vf", f"scale={THUMBNAIL_WIDTH}:{THUMBNAIL_HEIGHT}", output_file]
+    if at is not None:
+        args = ["-ss", str(at)] + args
+    run_ffmpeg(args)
+    return output_file
+
+
+def build_contact_sheet(moments, thumbnails, output_file, font_path):
+    """Lays the draft thumbnails out in a grid, each labelled with its title and time range."""
+    rows = -(-len(thumbnails) // SHEET_COLUMNS)
+    columns = min(len(thumbnails), SHEET_COLUMNS)
+    cell_height = THUMBNAIL_HEIGHT + LABEL_HEIGHT
+    sheet = Image.new("RGB", (max(columns, 1) * THUMBNAIL_WIDTH, max(rows, 1) * cell_height), "black")
+    draw = ImageDraw.Draw(sheet)
+    font = load_font(font_path, LABEL_FONT_SIZE)
+
+    for idx, (moment, thumbnail) in enumerate(zip(moments, thumbnails)):
+        x = (idx % SHEET_COLUMNS) * THUMBNAIL_WIDTH
+        y = (idx // SHEET_COLUMNS) * cell_height
+        with Image.open(thumbnail) as image:
+            sheet.paste(image.convert("RGB").resize((THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)), (x, y))
+
+        label = f"{idx + 1}. {moment['video_title']}\n{float(moment['start']):.0f}s - {float(moment['end']):.0f}s"
+        draw.multiline_text((x + 4, y + THUMBNAIL_HEIGHT + 4), label, font=font, fill="white", spacing=2)
+
+    sheet.save(output_file, quality=85)
+    print(f"🗂️ Contact sheet saved to {output_file}")
+    return output_file
+
+
+def render_drafts(video_url, video_path, moments, clip_transcripts, output_dir, threads=None):
+    """
+    Drafts every moment into `output_dir` and writes a contact sheet of their thumbnails.
+
+    Each moment's metadata is saved with `save_clip_metadata`, together with what `finalize`
+    needs to render it at full quality later: the source, the source video file and the
+    clip-relative subtitles. Returns the draft paths.
+    """
+    config = load_config()
+    os.makedirs(output_dir, exist_ok=True)
+    filler_pool = prepare_filler_pool(config) if config["video_type"] == FORMAT_TWO else None
+
+    drafts = []
+    thumbnails = []
+    drafted_moments = []
+    for moment, clip_transcript in zip(moments, clip_transcripts):
+        draft = os.path.join(output_dir, f"{moment['video_title']}.mp4")
+        try:
+            render_draft(video_path, moment, draft, clip_transcript, threads=threads, filler_pool=filler_pool)
+            duration = float(moment["end"]) - float(moment["start"])
+            # Past the caption intro, so the thumbnail shows the clip itself
+            thumbnail = extract_thumbnail(draft, os.path.splitext(draft)[0] + ".jpg", at=min(duration / 2, DRAFT_CAPTION_SECONDS + 1))
+        except Exception as e:
+            print(f"❌ Error drafting {moment['video_title']}: {e}")
+            continue
+
+        drafts.append(draft)
+        thumbnails.append(thumbnail)
+        drafted_moments.append(moment)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        metadata = dict(
+            moment, source=video_url, source_video=os.path.abspath(video_path), subtitles=clip_transcript, draft=draft
+        )
+        save_clip_metadata(metadata, f"{moment['video_title']}_{timestamp}.json")
+
+    if thumbnails:
+        build_contact_sheet(drafted_moments, thumbnails, os.path.join(output_dir, "contact_sheet.jpg"), config["font_path"])
+
+    print(f"✅ {len(drafts)} drafts saved in '{output_dir}/'")
+    return drafts
+
+
+def load_draft_metadata(metadata_file):
+    """
+    Splits a draft's saved metadata into `(moment, source, source_video, subtitles)`, `moment`
+    being the plain moment dict the renderers expect.
+    """
+    with open(metadata_file, "r", encoding="utf-8") as file:
+        metadata = json.load(file)
+
+    moment = {key: value for key, value in metadata.items() if key not in DRAFT_KEYS}
+    return moment, metadata.get("source"), metadata.get("source_video"), metadata.get("subtitles")
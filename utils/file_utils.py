@@ -1,26 +1,48 @@
 import os
 import json
+import shutil
+import uuid
 
-def cleanup_temp_files():
-    temp_folder = "temp"
+def cleanup_temp_files(temp_folder="temp"):
     if os.path.exists(temp_folder):
         for file in os.listdir(temp_folder):
-            os.remove(os.path.join(temp_folder, file))
+            path = os.path.join(temp_folder, file)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
 
-def save_final_videos(final_clips, output_folder="videos"):
+def create_workspace(job_id=None, temp_folder="temp"):
+    """
+    Creates an isolated working folder under `temp_folder` so concurrent jobs and clips
+    never write to the same intermediate files.
+
+    Returns the path of the new folder.
+    """
+    job_id = job_id or uuid.uuid4().hex[:12]
+    workspace = os.path.join(temp_folder, job_id)
+    os.makedirs(workspace, exist_ok=True)
+    return workspace
+
+def save_final_videos(final_clips, output_folder="videos", copy=False):
     """
     Moves final processed videos to the 'videos/' folder.
     
     Parameters:
     - final_clips (list): List of filenames for final processed videos.
     - output_folder (str): Folder to store the final videos.
+    - copy (bool): Copy instead of moving, e.g. to keep checkpointed clips in the cache.
     """
     os.makedirs(output_folder, exist_ok=True)  # Ensure the folder exists
     
     for clip in final_clips:
         destination = os.path.join(output_folder, os.path.basename(clip))
-        os.rename(clip, destination)
-        print(f"📂 Moved {clip} to {destination}")
+        if copy:
+            shutil.copy2(clip, destination)
+            print(f"📂 Copied {clip} to {destination}")
+        else:
+            os.rename(clip, destination)
+            print(f"📂 Moved {clip} to {destination}")
     
     print(f"✅ All final videos saved in '{output_folder}/' folder.")
 
@@ -0,0 +1,135 @@
+import bisect
+import json
+import os
+import random
+import subprocess
+import tempfile
+from utils.checkpoints import file_digest
+from utils.smart_cut import ffprobe_binary, run_ffmpeg
+
+FILLER_FOLDER = "video_fillers"
+FILLER_EXTENSIONS = ('.mp4', '.mov', '.avi')
+INDEX_FILE = "index.json"
+
+# Bottom half of the format-two canvas
+FILLER_WIDTH = 1080
+FILLER_HEIGHT = 960
+
+# Scale fillers narrower than 1080px up to 1080px, then crop 1080x960 starting 15% above the bottom
+NORMALIZE_FILTER = (
+    f"scale='if(lt(iw,{FILLER_WIDTH}),{FILLER_WIDTH},iw)':-2,"
+    f"crop={FILLER_WIDTH}:{FILLER_HEIGHT}:0:'max(0,ih-{FILLER_HEIGHT}-trunc(ih*0.15))'"
+)
+
+
+def probe_duration(video_path):
+    result = subprocess.run(
+        [ffprobe_binary(), "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", video_path],
+        check=True, capture_output=True, text=True,
+    )
+    return float(result.stdout.strip())
+
+
+def normalize_filler(source_path, output_file, fps):
+    """Transcodes a filler once to exactly 1080x960 at the output fps, with the bottom-offset crop applied."""
+    print(f"🎮 Normalizing filler {source_path}...")
+    # A unique temp file per call, since several jobs may prepare the pool at once
+    handle, tmp_file = tempfile.mkstemp(suffix=".mp4", dir=os.path.dirname(output_file) or ".")
+    os.close(handle)
+    try:
+        run_ffmpeg([
+            "-i", source_path, "-vf", NORMALIZE_FILTER, "-r", str(fps),
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p",
+            # A keyframe every second keeps seeking to any segment cheap
+            "-g", str(fps), "-c:a", "aac", tmp_file,
+        ])
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return output_file
+
+
+def load_index(cache_dir):
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_index(cache_dir, index):
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+
+    # Write a private temp file then rename, so concurrent readers never see a half-written index
+    handle, tmp_path = tempfile.mkstemp(suffix=".json", dir=cache_dir)
+    with os.fdopen(handle, "w", encoding="utf-8") as file:
+        json.dump(index, file, indent=4)
+    os.replace(tmp_path, index_path)
+
+
+def prepare_filler_pool(config, filler_folder=FILLER_FOLDER, fps=30):
+    """
+    Makes sure every filler in `filler_folder` has an up-to-date normalized copy in `filler_cache_dir`
+    and returns the pool as a list of `{"path", "duration"}` entries sorted by duration.
+
+    A filler is only re-hashed when its mtime or size changed, and only re-transcoded when its
+    content hash (or the output fps) changed.
+    """
+    cache_dir = config.get("filler_cache_dir", "cache/fillers")
+    os.makedirs(cache_dir, exist_ok=True)
+
+    fillers = sorted(f for f in os.listdir(filler_folder) if f.endswith(FILLER_EXTENSIONS))
+    if not fillers:
+        raise FileNotFoundError(f"No filler video found in the '{filler_folder}' directory.")
+
+    index = load_index(cache_dir)
+    changed = False
+    pool = []
+    for name in fillers:
+        source_path = os.path.join(filler_folder, name)
+        stat = os.stat(source_path)
+        entry = index.get(source_path)
+
+        fresh = (
+            entry is not None and entry["fps"] == fps and os.path.exists(entry["path"])
+            and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size
+        )
+        if not fresh:
+            digest = file_digest(source_path)
+            output_file = os.path.join(cache_dir, f"{digest[:16]}_{fps}fps.mp4")
+            if not os.path.exists(output_file):
+                normalize_filler(source_path, output_file, fps)
+
+            entry = {
+                "path": output_file,
+                "hash": digest,
+                "fps": fps,
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "duration": probe_duration(output_file),
+            }
+            index[source_path] = entry
+            changed = True
+
+        pool.append({"path": entry["path"], "duration": entry["duration"]})
+
+    # Forget fillers that were removed from the folder
+    for source_path in list(index):
+        if os.path.dirname(source_path) == filler_folder and os.path.basename(source_path) not in fillers:
+            del index[source_path]
+            changed = True
+
+    if changed:
+        save_index(cache_dir, index)
+
+    return sorted(pool, key=lambda filler: filler["duration"])
+
+
+def pick_filler(pool, duration):
+    """A random normalized filler at least `duration` seconds long (the longest one if none is)."""
+    durations = [filler["duration"] for filler in pool]
+    first_long_enough = bisect.bisect_left(durations, duration)
+    if first_long_enough == len(pool):
+        return pool[-1]
+    return random.choice(pool[first_long_enough:])
@@ -0,0 +1,151 @@
+import asyncio
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Finished spans and counter samples of this process
+_events = []
+_counters = defaultdict(float)
+_enabled = True
+_origin = time.perf_counter()
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = enabled
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@contextmanager
+def span(name, **args):
+    """
+    Times a block: wall and process CPU time (all threads, so overlapping spans share it),
+    peak RSS at the end, plus any `args`.
+
+    Yields the span's args dict so the block can attach results (frames rendered, tokens...).
+    """
+    if not _enabled:
+        yield args
+        return
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield args
+    finally:
+        wall_end = time.perf_counter()
+        _events.append({
+            "name": name,
+            "start": wall_start - _origin,
+            "wall": wall_end - wall_start,
+            "cpu": time.process_time() - cpu_start,
+            "peak_rss_mb": peak_rss_mb(),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+
+
+def instrument(name=None):
+    """Decorator wrapping every call of a function in a `span`."""
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+
+        @functools.wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            with span(span_name):
+                return await function(*args, **kwargs)
+
+        return async_wrapper if asyncio.iscoroutinefunction(function) else wrapper
+    return decorator
+
+
+def increment(counter, amount=1):
+    """Adds to a named counter (cache hits, LLM tokens...)."""
+    if _enabled:
+        _counters[counter] += amount
+
+
+def event_count():
+    return len(_events)
+
+
+def events_since(index):
+    """Spans recorded after `event_count()` returned `index`, e.g. to send back from a pool worker."""
+    return _events[index:]
+
+
+def merge_events(events):
+    """Adds spans recorded in another process (pool workers)."""
+    _events.extend(events)
+
+
+def export_chrome_trace(trace_file="trace.json"):
+    """Writes the spans and counters in Chrome trace format (open in chrome://tracing or Perfetto)."""
+    trace_events = []
+    for event in _events:
+        trace_events.append({
+            "name": event["name"],
+            "ph": "X",
+            "ts": event["start"] * 1e6,
+            "dur": event["wall"] * 1e6,
+            "pid": event["pid"],
+            "tid": event["tid"],
+            "args": dict(event["args"], cpu_s=round(event["cpu"], 3), peak_rss_mb=event["peak_rss_mb"]),
+        })
+
+    end = (time.perf_counter() - _origin) * 1e6
+    for counter, value in _counters.items():
+        trace_events.append({"name": counter, "ph": "C", "ts": end, "pid": os.getpid(), "args": {"value": value}})
+
+    with open(trace_file, "w", encoding="utf-8") as file:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
+
+    print(f"📈 Trace saved to {trace_file}")
+
+
+def summarize():
+    """Per-span totals: calls, wall/CPU seconds, max peak RSS, and frames per second where frames were recorded."""
+    summary = defaultdict(lambda: {"calls": 0, "wall": 0.0, "cpu": 0.0, "peak_rss_mb": 0.0, "frames": 0})
+    for event in _events:
+        row = summary[event["name"]]
+        row["calls"] += 1
+        row["wall"] += event["wall"]
+        row["cpu"] += event["cpu"]
+        row["peak_rss_mb"] = max(row["peak_rss_mb"], event["peak_rss_mb"] or 0)
+        row["frames"] += event["args"].get("frames", 0)
+    return dict(summary)
+
+
+def print_summary():
+    print("📊 Stage timings:")
+    print(f"   {'stage':<28} {'calls':>5} {'wall s':>9} {'cpu s':>9} {'peak MB':>8} {'fps':>7}")
+    for name, row in sorted(summarize().items(), key=lambda item: -item[1]["wall"]):
+        fps = f"{row['frames'] / row['wall']:.1f}" if row["frames"] and row["wall"] else "-"
+        print(f"   {name:<28} {row['calls']:>5} {row['wall']:>9.2f} {row['cpu']:>9.2f} {row['peak_rss_mb']:>8.0f} {fps:>7}")
+
+    for counter, value in sorted(_counters.items()):
+        print(f"   {counter:<28} {value:>g}")
@@ -0,0 +1,88 @@
+import json
+import os
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    stage TEXT,
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def open_queue(queue_file="cache/jobs.sqlite3"):
+    """Opens (creating if needed) the SQLite job queue shared by `worker.py enqueue` and the worker."""
+    os.makedirs(os.path.dirname(queue_file) or ".", exist_ok=True)
+    connection = sqlite3.connect(queue_file, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    # WAL lets the CLI enqueue jobs while the worker holds the database open
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(SCHEMA)
+    return connection
+
+
+def enqueue(connection, sources):
+    """Queues one job per source (YouTube URL or local file) and returns their ids."""
+    now = time.time()
+    job_ids = []
+    for source in sources:
+        cursor = connection.execute(
+            "INSERT INTO jobs (source, status, created_at, updated_at) VALUES (?, 'queued', ?, ?)", (source, now, now)
+        )
+        job_ids.append(cursor.lastrowid)
+    return job_ids
+
+
+def claim_next(connection):
+    """Atomically marks the oldest queued job as running and returns it, or None if the queue is empty."""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        row = connection.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        job = None
+        if row is not None:
+            job = dict(row, status="running")
+            connection.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (time.time(), job["id"]))
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    return job
+
+
+def set_stage(connection, job_id, stage):
+    connection.execute("UPDATE jobs SET stage = ?, updated_at = ? WHERE id = ?", (stage, time.time(), job_id))
+
+
+def finish_job(connection, job_id, result):
+    connection.execute(
+        "UPDATE jobs SET status = 'done', result = ?, updated_at = ? WHERE id = ?", (json.dumps(result), time.time(), job_id)
+    )
+
+
+def fail_job(connection, job_id, error):
+    connection.execute(
+        "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?", (str(error), time.time(), job_id)
+    )
+
+
+def requeue_interrupted(connection):
+    """Puts jobs left 'running' by a worker that was stopped back in the queue. Returns how many."""
+    cursor = connection.execute(
+        "UPDATE jobs SET status = 'queued', stage = NULL, updated_at = ? WHERE status = 'running'", (time.time(),)
+    )
+    return cursor.rowcount
+
+
+def list_jobs(connection, status=None):
+    if status:
+        rows = connection.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id", (status,))
+    else:
+        rows = connection.execute("SELECT * FROM jobs ORDER BY id")
+    return [dict(row) for row in rows]
@@ -0,0 +1,46 @@
+import hashlib
+import json
+
+_caches = {}
+
+
+def get_moments_cache(config):
+    """
+    Returns the persistent cache of LLM moment extraction results, or None when disabled.
+
+    The cache lives in `llm_cache_dir` and evicts least recently used entries once it grows
+    past `llm_cache_size_mb`.
+    """
+    if not config.get("llm_cache_enabled", True):
+        return None
+
+    directory = config.get("llm_cache_dir", "cache/llm_moments")
+    if directory not in _caches:
+        from diskcache import Cache
+
+        cache = Cache(
+            directory,
+            size_limit=config.get("llm_cache_size_mb", 256) * 1024 * 1024,
+            eviction_policy="least-recently-used",
+        )
+        _caches[directory] = cache
+
+    return _caches[directory]
+
+
+def moments_cache_key(chunk, model_name, prompt_version, num_moments, min_time, max_time):
+    """Content hash of everything that influences the LLM reply for a chunk."""
+    payload = json.dumps(
+        {
+            "chunk": chunk,
+            "model": model_name,
+            "prompt_version": prompt_version,
+            "num_moments": num_moments,
+            "min_time": str(min_time),
+            "max_time": str(max_time),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import random
+import time
+import weakref
+from utils.instrumentation import span, increment
+
+# HTTP status codes worth retrying: rate limited or a transient server error
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `rate_per_minute`, holding at most `capacity` tokens."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    async def acquire(self, amount=1):
+        """Waits until `amount` tokens are available and takes them."""
+        amount = min(amount, self.capacity)  # A single oversized request must still go through eventually
+
+        async with self.lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate_per_second)
+                self._refill()
+            self.tokens -= amount
+
+
+class GeminiClient:
+    """Default LLM client. Any object with a `generate(prompt) -> str` method can replace it (e.g. a local fake model)."""
+
+    def __init__(self, model_name="gemini-1.5-pro"):
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+
+        # Load environment variables
+        load_dotenv()
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+
+def is_retryable_error(error):
+    """True for rate limiting (429) and transient server (5xx) errors."""
+    code = getattr(error, "code", None)
+    if callable(code):
+        code = code()
+    return code in RETRYABLE_STATUS_CODES
+
+
+class RequestScheduler:
+    """
+    Runs LLM requests concurrently while staying inside the RPM / TPM quota.
+
+    Each request waits for a request token and for its estimated prompt tokens, then runs on a
+    worker thread (the client is synchronous). Rate limited and 5xx responses are retried with
+    exponential backoff and jitter.
+    """
+
+    def __init__(self, client, rpm, tpm=None, max_concurrency=4, max_retries=5, base_backoff=2.0):
+        self.client = client
+        # A burst of one spaces requests 60 / rpm seconds apart, so no minute ever sees more than `rpm`
+        self.request_bucket = TokenBucket(rpm, capacity=1)
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+
+    async def generate(self, prompt, estimated_tokens=None):
+        """Sends `prompt` once quota allows and returns the raw response text."""
+        estimated_tokens = estimated_tokens or count_tokens(prompt)
+
+        for attempt in range(self.max_retries + 1):
+            await self.request_bucket.acquire()
+            if self.token_bucket:
+                await self.token_bucket.acquire(estimated_tokens)
+
+            async with self.semaphore:
+                try:
+                    with span("llm_request", prompt_tokens=estimated_tokens, attempt=attempt):
+                        increment("llm_requests")
+                        increment("llm_prompt_tokens", estimated_tokens)
+                        return await asyncio.to_thread(self.client.generate, prompt)
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable_error(e):
+                        raise
+                    error = e
+                    delay = self.base_backoff * (2 ** attempt) * (1 + random.random())
+
+            print(f"🔁 LLM request failed ({error}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+
+_encoding = None
+
+
+def count_tokens(text):
+    """
+    Token count of `text` measured with tiktoken's cl100k_base encoding (a close proxy for
+    Gemini's tokenizer that runs locally). Falls back to ~4 characters per token if the
+    encoding can't be loaded.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"⚠️ tiktoken unavailable ({e}), estimating tokens from length.")
+            _encoding = False
+
+    if _encoding:
+        return max(1, len(_encoding.encode(text, disallowed_special=())))
+    return max(1, len(text) // 4)
+
+
+_clients = {}
+
+
+def get_client(model_name):
+    """Gemini client for `model_name`, created once per process and reused by later jobs."""
+    if model_name not in _clients:
+        _clients[model_name] = GeminiClient(model_name)
+    return _clients[model_name]
+
+
+# Event loop -> {scheduler settings: RequestScheduler}; the buckets' asyncio primitives belong to one loop
+_schedulers = weakref.WeakKeyDictionary()
+
+
+def create_scheduler(config, client=None):
+    """
+    RequestScheduler for the `llm_*` settings in config.json.
+
+    For the Gemini client the scheduler is shared by every job of the process (per model and
+    settings), so concurrent jobs draw from one RPM/TPM budget instead of each getting a full
+    quota. A custom `client` gets a scheduler of its own.
+    """
+    settings = {
+        "rpm": config.get("llm_rpm", 2),
+        "tpm": config.get("llm_tpm"),
+        "max_concurrency": config.get("llm_max_concurrency", 2),
+        "max_retries": config.get("llm_max_retries", 5),
+    }
+    if client is not None:
+        return RequestScheduler(client, **settings)
+
+    model_name = config.get("llm_model", "gemini-1.5-pro")
+    schedulers = _schedulers.setdefault(asyncio.get_running_loop(), {})
+    key = (model_name,) + tuple(settings.values())
+    if key not in schedulers:
+        schedulers[key] = RequestScheduler(get_client(model_name), **settings)
+    return schedulers[key]
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Loaded models, most recently used last: key -> {"model", "size_mb", "last_used"}
+_models = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_model(key, loader, size_mb=0, max_total_mb=None, idle_seconds=None):
+    """
+    Returns the model registered under `key`, calling `loader()` only the first time
+    it is requested in this process.
+
+    Parameters:
+    - key (tuple): Hashable description of the model configuration (name, size, compute type...).
+    - loader (callable): Builds the model when it is not loaded yet.
+    - size_mb (int): Estimated resident memory of the model, used for the memory cap.
+    - max_total_mb (int): Evict least recently used models so the total stays under this cap.
+    - idle_seconds (int): Evict models that have not been used for this long.
+    """
+    with _lock:
+        evict_idle_models(idle_seconds)
+
+        entry = _models.get(key)
+        if entry is not None:
+            entry["last_used"] = time.monotonic()
+            _models.move_to_end(key)
+            return entry["model"]
+
+        if max_total_mb:
+            _evict_until_fits(size_mb, max_total_mb)
+
+        print(f"📦 Loading model {key}...")
+        model = loader()
+        _models[key] = {"model": model, "size_mb": size_mb, "last_used": time.monotonic()}
+        return model
+
+
+def evict_idle_models(idle_seconds):
+    """Drops every model that has not been used for `idle_seconds`."""
+    if not idle_seconds:
+        return
+
+    now = time.monotonic()
+    for key in [key for key, entry in _models.items() if now - entry["last_used"] > idle_seconds]:
+        print(f"🧹 Unloading idle model {key}")
+        del _models[key]
+
+
+def _evict_until_fits(size_mb, max_total_mb):
+    while _models and loaded_memory_mb() + size_mb > max_total_mb:
+        key, _ = _models.popitem(last=False)
+        print(f"🧹 Unloading model {key} to stay under {max_total_mb} MB")
+
+
+def loaded_memory_mb():
+    """Estimated memory of all loaded models."""
+    return sum(entry["size_mb"] for entry in _models.values())
+
+
+def clear_models():
+    """Unloads every model held by the registry."""
+    with _lock:
+        _models.clear()
@@ -0,0 +1,123 @@
+import numpy as np
+from utils.audio_pipeline import SAMPLE_RATE
+
+# Weights of each per-second feature in a window's score
+FEATURE_WEIGHTS = {
+    "speech_rate": 1.0,
+    "energy_spike": 1.0,
+    "laughter": 0.75,
+    "silence": -1.5,
+}
+
+
+def zscore(values):
+    std = values.std()
+    return (values - values.mean()) / std if std > 0 else np.zeros_like(values)
+
+
+def speech_features(transcript_data, duration):
+    """Per-second words spoken and speech coverage (0-1), spread over each entry's [start, end)."""
+    words = np.zeros(duration, dtype=np.float32)
+    coverage = np.zeros(duration, dtype=np.float32)
+    if not transcript_data:
+        return words, coverage
+
+    starts = np.array([entry["start"] for entry in transcript_data], dtype=np.float64)
+    ends = np.maximum(np.array([entry["end"] for entry in transcript_data], dtype=np.float64), starts + 1e-3)
+    counts = np.array([len(entry["text"].split()) for entry in transcript_data], dtype=np.float32)
+
+    # Credit each entry to the second it starts in; entries are at most a few words long
+    seconds = np.clip(starts.astype(np.int64), 0, duration - 1)
+    np.add.at(words, seconds, counts)
+
+    # Speech coverage via a difference array over whole seconds
+    diff = np.zeros(duration + 1, dtype=np.float32)
+    np.add.at(diff, np.clip(np.floor(starts).astype(np.int64), 0, duration), 1)
+    np.add.at(diff, np.clip(np.ceil(ends).astype(np.int64), 0, duration), -1)
+    coverage = np.minimum(np.cumsum(diff[:-1]), 1)
+
+    return words, coverage
+
+
+def audio_energy(samples, duration, sample_rate=SAMPLE_RATE, block_seconds=600):
+    """Per-second RMS of the PCM samples, computed in blocks so a memory-mapped file is never fully loaded."""
+    rms = np.zeros(duration, dtype=np.float32)
+    if samples is None:
+        return rms
+
+    whole_seconds = min(duration, len(samples) // sample_rate)
+    for block_start in range(0, whole_seconds, block_seconds):
+        block_end = min(block_start + block_seconds, whole_seconds)
+        block = np.asarray(samples[block_start * sample_rate:block_end * sample_rate]).reshape(-1, sample_rate)
+        rms[block_start:block_end] = np.sqrt(np.mean(np.square(block, dtype=np.float32), axis=1))
+
+    return rms
+
+
+def rolling_median(values, window=31):
+    """Median over a centered window (edges padded), vectorized with a strided view."""
+    pad = window // 2
+    padded = np.pad(values, pad, mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    return np.median(windows, axis=1)
+
+
+def per_second_scores(transcript_data, duration, samples=None):
+    """Combined per-second interest score from speech rate, energy spikes, laughter-like bursts and silence."""
+    words, coverage = speech_features(transcript_data, duration)
+    rms = audio_energy(samples, duration)
+
+    energy_spike = np.maximum(rms - rolling_median(rms), 0)
+    # Loud seconds with little speech are often laughter, applause or shouting
+    laughter = energy_spike * (1 - np.minimum(words / 3, 1))
+    silence = (coverage == 0).astype(np.float32)
+
+    features = {
+        "speech_rate": zscore(words),
+        "energy_spike": zscore(energy_spike),
+        "laughter": zscore(laughter),
+        "silence": silence,
+    }
+    return sum(FEATURE_WEIGHTS[name] * values for name, values in features.items())
+
+
+def score_windows(transcript_data, duration, min_length, max_length, top_k, samples=None, num_lengths=3):
+    """
+    Ranks sliding windows of `min_length`..`max_length` seconds by their mean per-second score
+    and returns the `top_k` best non-overlapping ones as `(start, end, score)`, best first.
+
+    Parameters:
+    - transcript_data (list): Transcript entries with "start", "end" and "text".
+    - duration (float): Source duration in seconds.
+    - samples (array): Optional 16 kHz mono PCM (e.g. the memory-mapped ASR buffer) for audio features.
+    """
+    duration = int(np.ceil(duration))
+    if duration <= 0:
+        return []
+
+    scores = per_second_scores(transcript_data, duration, samples)
+    cumulative = np.concatenate([[0.0], np.cumsum(scores, dtype=np.float64)])
+
+    candidates = []
+    for length in np.unique(np.linspace(min_length, max_length, num_lengths).astype(int)):
+        length = min(int(length), duration)
+        starts = np.arange(0, duration - length + 1)
+        means = (cumulative[starts + length] - cumulative[starts]) / length
+        candidates.append(np.stack([starts, starts + length, means], axis=1))
+
+    candidates = np.concatenate(candidates)
+    candidates = candidates[np.argsort(-candidates[:, 2], kind="stable")]
+
+    # Greedy non-maximum suppression: keep the best window, drop anything overlapping a kept one
+    occupied = np.zeros(duration, dtype=bool)
+    selected = []
+    for start, end, score in candidates:
+        start, end = int(start), int(end)
+        if occupied[start:end].any():
+            continue
+        occupied[start:end] = True
+        selected.append((float(start), float(end), float(score)))
+        if len(selected) >= top_k:
+            break
+
+    return selected
@@ -0,0 +1,177 @@
+import bisect
+import re
+import numpy as np
+
+
+class MomentIndex:
+    """Non-overlapping moments kept sorted by start, so overlap lookups are a binary search."""
+
+    def __init__(self):
+        self.starts = []
+        self.moments = []
+
+    def __len__(self):
+        return len(self.moments)
+
+    def overlapping(self, start, end):
+        """Index range `(lo, hi)` of the kept moments overlapping [start, end)."""
+        hi = bisect.bisect_left(self.starts, end)
+        lo = bisect.bisect_right(self.starts, start)
+        # The moment starting before `start` may still reach into it
+        if lo > 0 and self.moments[lo - 1]["end"] > start:
+            lo -= 1
+        return lo, hi
+
+    def overlaps(self, start, end):
+        lo, hi = self.overlapping(start, end)
+        return lo < hi
+
+    def replace(self, lo, hi, moment):
+        """Replaces the kept moments `lo`..`hi - 1` (none when lo == hi) with `moment`."""
+        del self.starts[lo:hi]
+        del self.moments[lo:hi]
+        idx = bisect.bisect_left(self.starts, moment["start"])
+        self.starts.insert(idx, moment["start"])
+        self.moments.insert(idx, moment)
+
+    def free_time(self, start, end):
+        """Seconds of [start, end) not covered by a kept moment."""
+        lo, hi = self.overlapping(start, end)
+        covered = sum(min(m["end"], end) - max(m["start"], start) for m in self.moments[lo:hi])
+        return (end - start) - covered
+
+
+class Boundaries:
+    """
+    Where a clip may start or end: transcript entry starts/ends (always between words), each
+    weighted by the silence next to it so cuts prefer pauses over mid-sentence word gaps.
+    """
+
+    def __init__(self, transcript_data, duration=None):
+        self.starts = np.array([entry["start"] for entry in transcript_data], dtype=np.float64)
+        self.ends = np.array([entry["end"] for entry in transcript_data], dtype=np.float64)
+        self.texts = [entry["text"].strip() for entry in transcript_data]
+        self.duration = float(duration) if duration else (float(self.ends[-1]) if len(self.ends) else 0.0)
+
+        # Silence before each start and after each end
+        self.start_gaps = self.starts - np.concatenate(([0.0], self.ends[:-1])) if len(self.starts) else self.starts
+        self.end_gaps = np.concatenate((self.starts[1:], [self.duration])) - self.ends if len(self.ends) else self.ends
+
+    @staticmethod
+    def best(points, gaps, target, low, high):
+        """The point in [low, high] with the longest silence, nearest to `target` on ties; `target` if there is none."""
+        lo = np.searchsorted(points, low, side="left")
+        hi = np.searchsorted(points, high, side="right")
+        if lo >= hi:
+            return target
+        candidates = points[lo:hi]
+        order = np.lexsort((np.abs(candidates - target), -np.round(gaps[lo:hi], 1)))
+        return float(candidates[order[0]])
+
+    def snap_start(self, target, low, high):
+        return self.best(self.starts, self.start_gaps, target, low, high)
+
+    def snap_end(self, target, low, high):
+        return self.best(self.ends, self.end_gaps, target, low, high)
+
+    def text(self, start, end):
+        """Transcript text spoken inside [start, end]."""
+        lo = np.searchsorted(self.starts, start, side="left")
+        hi = np.searchsorted(self.ends, end, side="right")
+        return " ".join(self.texts[lo:hi])
+
+
+def slugify_title(title):
+    """`video_title` as a safe file name (it names the clip, voice and metadata files)."""
+    return re.sub(r"[^\w-]+", "_", str(title)).strip("_").lower() or "moment"
+
+
+def fit_moment(moment, boundaries, min_time, max_time, snap_seconds):
+    """
+    Clamps a moment to the source, snaps its start/end to nearby word/silence boundaries and brings
+    it within `min_time`..`max_time`. Returns the adjusted copy, or None if it can't be made valid.
+    """
+    try:
+        start = max(float(moment["start"]), 0.0)
+        end = min(float(moment["end"]), boundaries.duration)
+    except (TypeError, ValueError):
+        return None
+    if end <= start:
+        return None
+
+    start = boundaries.snap_start(start, start - snap_seconds, start + snap_seconds)
+    end = boundaries.snap_end(end, end - snap_seconds, end + snap_seconds)
+    end = min(end, boundaries.duration)
+
+    if end - start > max_time:
+        limit = start + max_time
+        end = boundaries.snap_end(limit, max(limit - snap_seconds, start + min_time), limit)
+    elif end - start < min_time:
+        # Extend forward first, then backward if the source ends too soon
+        target = start + min_time
+        end = boundaries.snap_end(target, target, min(target + snap_seconds, start + max_time))
+        if end > boundaries.duration:
+            end = boundaries.duration
+            target = max(end - min_time, 0.0)
+            start = boundaries.snap_start(target, max(target - snap_seconds, end - max_time), target)
+
+    if not min_time <= round(end - start, 3) <= max_time:
+        return None
+
+    return dict(moment, start=round(start, 2), end=round(end, 2))
+
+
+def validate_moments(moments, transcript_data, config, kept=None, duration=None):
+    """
+    Turns the raw LLM moments into a clean, render-ready list:
+
+    - times outside the source are clamped, and start/end snapped to the nearest quiet word
+      boundary within `moment_snap_seconds`;
+    - moments are brought within `minimum_moment_time`..`maximum_moment_time`, or dropped;
+    - overlapping moments are merged when the union is short enough, otherwise the later one
+      in the LLM's order is dropped (duplicates are just merged away);
+    - `video_title`s become unique, file-safe names.
+
+    `kept` is an existing `MomentIndex` to add to (used when topping up). Returns the index;
+    its `moments` are sorted by start.
+    """
+    min_time = float(config["minimum_moment_time"])
+    max_time = float(config["maximum_moment_time"])
+    snap_seconds = float(config.get("moment_snap_seconds", 2.0))
+
+    boundaries = Boundaries(transcript_data, duration)
+    kept = kept if kept is not None else MomentIndex()
+    dropped = 0
+
+    for raw_moment in moments:
+        moment = fit_moment(raw_moment, boundaries, min_time, max_time, snap_seconds)
+        if moment is None:
+            dropped += 1
+            continue
+
+        lo, hi = kept.overlapping(moment["start"], moment["end"])
+        if lo < hi:
+            start = min(moment["start"], kept.moments[lo]["start"])
+            end = max(moment["end"], kept.moments[hi - 1]["end"])
+            if end - start > max_time:
+                dropped += 1
+                continue
+
+            # The merged clip keeps the caption and title of the moment that was kept first
+            moment = dict(kept.moments[lo], start=start, end=end, transcript=boundaries.text(start, end))
+
+        kept.replace(lo, hi, moment)
+
+    titles = set()
+    for moment in kept.moments:
+        title = base = slugify_title(moment["video_title"])
+        suffix = 2
+        while title in titles:
+            title = f"{base}_{suffix}"
+            suffix += 1
+        titles.add(title)
+        moment["video_title"] = title
+
+    if dropped:
+        print(f"🧹 Dropped {dropped} invalid or overlapping moments.")
+    return kept
@@ -0,0 +1,87 @@
+import os
+from moviepy.editor import AudioFileClip
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+# Gaps without any moment longer than this are skipped with a seek instead of being decoded
+SEEK_GAP_SECONDS = 30
+
+
+def extract_moments_single_pass(video_path, moments, output_files, threads=None):
+    """
+    Cuts every moment from `video_path` with a single front-to-back decode.
+
+    Moments are visited in start order; each decoded frame is written to every moment whose
+    [start, end) window contains it, so overlapping or nearby moments share one decode instead
+    of seeking and decoding the same region again. Only the current frame is held in memory.
+
+    Parameters:
+    - video_path (str): Source video.
+    - moments (list): Moments with "start" and "end".
+    - output_files (list): Output path for each moment, same order as `moments`.
+    - threads (int): Threads given to each ffmpeg encoder.
+    """
+    if not moments:
+        return []
+
+    windows = sorted(
+        (float(moment["start"]), float(moment["end"]), output_file)
+        for moment, output_file in zip(moments, output_files)
+    )
+
+    # Audio is cheap to cut, so write each moment's track first and mux it in while encoding
+    source_audio = AudioFileClip(video_path)
+    audio_files = {}
+    for start, end, output_file in windows:
+        audio_file = os.path.splitext(output_file)[0] + "_audio.m4a"
+        source_audio.subclip(start, min(end, source_audio.duration)).write_audiofile(audio_file, codec="aac", logger=None)
+        audio_files[output_file] = audio_file
+    source_audio.close()
+
+    reader = FFMPEG_VideoReader(video_path)
+    fps = reader.fps
+    end_of_video = reader.duration
+
+    active = {}  # output_file -> (end, writer)
+    next_window = 0
+    frame_index = round(windows[0][0] * fps)
+    reader.initialize(frame_index / fps)
+    print(f"🎞️ Decoding {video_path} once for {len(windows)} moments...")
+
+    while next_window < len(windows) or active:
+        t = frame_index / fps
+        if t >= end_of_video:
+            break
+
+        # Nothing to write until the next moment: jump there if the gap is long
+        if not active and windows[next_window][0] - t > SEEK_GAP_SECONDS:
+            frame_index = round(windows[next_window][0] * fps)
+            reader.initialize(frame_index / fps)
+            continue
+
+        while next_window < len(windows) and windows[next_window][0] <= t:
+            start, end, output_file = windows[next_window]
+            writer = FFMPEG_VideoWriter(
+                output_file, reader.size, fps, codec="libx264", audiofile=audio_files[output_file], threads=threads
+            )
+            active[output_file] = (end, writer)
+            next_window += 1
+
+        frame = reader.read_frame()
+        for output_file, (end, writer) in list(active.items()):
+            if t >= end:
+                writer.close()
+                del active[output_file]
+            else:
+                writer.write_frame(frame)
+
+        frame_index += 1
+
+    for end, writer in active.values():
+        writer.close()
+    reader.close()
+
+    for audio_file in audio_files.values():
+        os.remove(audio_file)
+
+    return output_files
@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from utils.config_loader import load_config
+from utils.file_utils import save_clip_metadata
+from utils.video_editor import trim_video, process_video, render_moment
+from utils.ai_voice_generator import resolve_voice
+from utils.instrumentation import event_count, events_since, merge_events
+
+# libx264 stops scaling well past a handful of threads per encode, so prefer more parallel encodes
+DEFAULT_THREADS_PER_ENCODE = 4
+
+
+def plan_render_parallelism(num_clips, workers=0, threads=0, cpu_count=None):
+    """
+    Picks how many clips to render at once and how many threads each ffmpeg encode gets,
+    so that workers * threads stays within the available cores.
+
+    Parameters:
+    - num_clips (int): Number of clips to render.
+    - workers (int): Requested pool size (0 = auto).
+    - threads (int): Requested threads per encode (0 = auto).
+
+    Returns a (workers, threads) tuple.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+
+    if not workers:
+        workers = max(1, cpu_count // (threads or DEFAULT_THREADS_PER_ENCODE))
+    workers = max(1, min(workers, num_clips))
+
+    # With fewer clips than workers, give the spare cores to each encode
+    if not threads:
+        threads = max(1, cpu_count // workers)
+
+    return workers, threads
+
+
+def render_clip_job(video_path, moment, voice, clip_transcript, clip_dir, threads, filler_pool=None):
+    """
+    Renders a single moment inside its own workspace. Runs in a pool worker.
+
+    Returns the output path and the spans recorded while rendering, so the parent can merge them.
+    """
+    config = load_config()
+    first_event = event_count()
+    os.makedirs(clip_dir, exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    video_title = moment['video_title']
+    output_video = os.path.join(clip_dir, f"{video_title}_{timestamp}.mp4")
+
+    if config.get("fused_render", False):
+        render_moment(video_path, moment, output_video, voice, clip_transcript, threads=threads, filler_pool=filler_pool)
+        save_clip_metadata(moment, f"{video_title}_{timestamp}.json")
+    else:
+        # trim_video saves the clip metadata itself
+        clip = trim_video(video_path, [moment], output_dir=clip_dir, threads=threads)[0]
+        output_video = clip
+        process_video(clip, output_video, voice, moment["caption"], clip_transcript, workdir=clip_dir, threads=threads, filler_pool=filler_pool)
+
+    return output_video, events_since(first_event)
+
+
+def render_moments_parallel(video_path, moments, caption_voices, clip_transcripts, job_dir, workers=0, threads=0, on_rendered=None, filler_pool=None):
+    """
+    Fans the moments out to a bounded process pool, each clip rendered in `job_dir/clip_<n>/`.
+
+    `on_rendered(moment, output_video)` runs in this process as each clip finishes and may return
+    a new path for it. Returns the final clip paths in the same order as `moments`. A clip that
+    fails doesn't stop the others, but once they are done a `RuntimeError` is raised (like the
+    sequential renderers do), so the job isn't reported as done with clips missing.
+
+    Workers are spawned rather than forked: the parent already runs threads (asyncio `to_thread`,
+    the TTS executor, Whisper), and forking a threaded process can deadlock the children.
+    """
+    workers, threads = plan_render_parallelism(len(moments), workers, threads)
+    print(f"🚀 Rendering {len(moments)} clips with {workers} workers x {threads} ffmpeg threads...")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            # Voices may still be synthesizing in the background; each clip is queued once its voice is ready
+            pool.submit(
+                render_clip_job, video_path, moment, resolve_voice(voice), clip_transcript,
+                os.path.join(job_dir, f"clip_{idx:02d}"), threads, filler_pool,
+            ): idx
+            for idx, (moment, voice, clip_transcript) in enumerate(zip(moments, caption_voices, clip_transcripts))
+        }
+
+        rendered = {}
+        failed = []
+        for future in as_completed(futures):
+            moment = moments[futures[future]]
+            try:
+                output_video, events = future.result()
+            except Exception as e:
+                print(f"❌ Error rendering {moment['video_title']}: {e}")
+                failed.append(moment["video_title"])
+                continue
+
+            merge_events(events)
+            if on_rendered:
+                output_video = on_rendered(moment, output_video) or output_video
+            rendered[futures[future]] = output_video
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(moments)} clips failed to render: {', '.join(failed)}")
+
+    return [rendered[idx] for idx in sorted(rendered)]
@@ -0,0 +1,195 @@
+import bisect
+import json
+import os
+import shutil
+import subprocess
+
+
+def ffmpeg_binary():
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+
+def ffprobe_binary():
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe is None:
+        raise FileNotFoundError("ffprobe not found in PATH; it is needed for smart-cut trimming.")
+    return ffprobe
+
+
+def run_ffmpeg(args):
+    subprocess.run([ffmpeg_binary(), "-y", "-v", "error"] + args, check=True, capture_output=True)
+
+
+def probe_video_stream(video_path):
+    """Codec settings and size of the first video stream, needed to encode boundary GOPs that concat cleanly with it."""
+    result = subprocess.run(
+        [ffprobe_binary(), "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "stream=codec_name,profile,pix_fmt,time_base,width,height", "-of", "json", video_path],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(result.stdout)["streams"][0]
+
+
+def probe_start_time(video_path):
+    """Start time (seconds) of the file; `-ss` seeks relative to it, while packet times are absolute."""
+    result = subprocess.run(
+        [ffprobe_binary(), "-v", "error", "-show_entries", "format=start_time", "-of", "json", video_path],
+        check=True, capture_output=True, text=True,
+    )
+    start_time = json.loads(result.stdout).get("format", {}).get("start_time")
+    return float(start_time) if start_time not in (None, "N/A") else 0.0
+
+
+def probe_frame_times(video_path):
+    """
+    Sorted presentation times (seconds) of the keyframes and of every frame in the first video
+    stream, as `(keyframes, frame_times)`. They are relative to the start of the file like `-ss`
+    and the transcript times, since MPEG-TS or B-frame offsets don't start at 0.
+
+    Reads packet flags only, so nothing is decoded.
+    """
+    result = subprocess.run(
+        [ffprobe_binary(), "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path],
+        check=True, capture_output=True, text=True,
+    )
+    start_time = probe_start_time(video_path)
+
+    keyframes = []
+    frame_times = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if pts_time in ("", "N/A"):
+            continue
+        frame_time = round(float(pts_time) - start_time, 6)
+        frame_times.append(frame_time)
+        if "K" in flags:
+            keyframes.append(frame_time)
+
+    return sorted(keyframes), sorted(frame_times)
+
+
+def count_video_packets(video_file):
+    """Number of packets (frames) in the first video stream, counted without decoding."""
+    result = subprocess.run(
+        [ffprobe_binary(), "-v", "error", "-select_streams", "v:0", "-count_packets",
+         "-show_entries", "stream=nb_read_packets", "-of", "csv=p=0", video_file],
+        check=True, capture_output=True, text=True,
+    )
+    return int(result.stdout.strip())
+
+
+def encode_segment(video_path, start, frames, output_file, stream_info):
+    """
+    Re-encodes `frames` frames of the video track from `start` with settings matching the source
+    stream. The SPS/PPS are repeated in-band, since the concatenated file can only carry one set in
+    its header.
+    """
+    args = [
+        "-ss", f"{start:.6f}", "-i", video_path, "-frames:v", str(frames), "-an", "-vsync", "passthrough",
+        "-c:v", "libx264", "-x264-params", "repeat-headers=1",
+    ]
+    if stream_info.get("pix_fmt"):
+        args += ["-pix_fmt", stream_info["pix_fmt"]]
+    if stream_info.get("profile"):
+        args += ["-profile:v", stream_info["profile"].lower().replace(" ", "")]
+    if stream_info.get("time_base"):
+        args += ["-video_track_timescale", stream_info["time_base"].split("/")[1]]
+    run_ffmpeg(args + [output_file])
+
+
+def copy_segment(video_path, start, frames, output_file):
+    """
+    Stream-copies `frames` frames of the video track from `start`, which must be a keyframe. The
+    source SPS/PPS are written in front of every keyframe, so the copied GOPs keep decoding with
+    their own headers.
+
+    The length is a frame count rather than `-t` (here and in `encode_segment`): a stream copy stops
+    on decode timestamps, which lag behind with B-frames, and a duration ending on a keyframe can
+    round up to include it, so either way frames of the next piece would be pulled in.
+    """
+    run_ffmpeg([
+        "-ss", f"{start:.6f}", "-i", video_path, "-frames:v", str(frames), "-an",
+        "-c:v", "copy", "-bsf:v", "h264_mp4toannexb", output_file,
+    ])
+
+
+def check_cut(video_file, expected_frames):
+    """Decodes `video_file` to nowhere and checks its frame count; raises `RuntimeError` if either fails."""
+    try:
+        run_ffmpeg(["-xerror", "-i", video_file, "-f", "null", "-"])
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"{video_file} doesn't decode cleanly: {e.stderr.decode(errors='replace').strip()}") from e
+
+    frames = count_video_packets(video_file)
+    if frames != expected_frames:
+        raise RuntimeError(f"{video_file} has {frames} frames instead of {expected_frames}")
+
+
+def smart_cut(video_path, start_time, end_time, output_file, keyframes, frame_times, stream_info, workdir):
+    """
+    Frame-accurate cut of [start_time, end_time) that only re-encodes the partial GOPs at the edges.
+
+    The whole GOPs between the first keyframe after `start_time` and the last keyframe before
+    `end_time` are stream-copied, the head and tail are re-encoded with matching settings, the
+    pieces are concatenated without re-encoding, and the source audio is cut to the same window.
+
+    Every piece carries its own SPS/PPS in-band and the output is tagged `avc3` (parameter sets may
+    change in-band), so the copied GOPs never decode against the headers of the re-encoded head.
+    The result is decoded once and its frames counted against `frame_times` (see `probe_frame_times`)
+    before it is returned; any error raises so the caller can re-encode.
+    """
+    # First keyframe at/after the start and last keyframe at/before the end
+    idx = bisect.bisect_left(keyframes, start_time)
+    first_key = min(keyframes[idx], end_time) if idx < len(keyframes) else end_time
+    idx = bisect.bisect_right(keyframes, end_time) - 1
+    last_key = max(keyframes[idx], first_key) if idx >= 0 else first_key
+
+    # (start, end, copy?) pieces of the video track
+    pieces = []
+    if first_key > start_time:
+        pieces.append((start_time, first_key, False))
+    if last_key > first_key:
+        pieces.append((first_key, last_key, True))
+    if end_time > last_key:
+        pieces.append((last_key, end_time, False))
+
+    base_name = os.path.splitext(os.path.basename(output_file))[0]
+    piece_files = []
+    for idx, (piece_start, piece_end, copy) in enumerate(pieces):
+        piece_file = os.path.join(workdir, f"{base_name}_part{idx}.mp4")
+        frames = bisect.bisect_left(frame_times, piece_end) - bisect.bisect_left(frame_times, piece_start)
+        if frames == 0:
+            continue  # e.g. a start before the first frame, when the video starts after the audio
+        if copy:
+            copy_segment(video_path, piece_start, frames, piece_file)
+        else:
+            encode_segment(video_path, piece_start, frames, piece_file, stream_info)
+        piece_files.append(piece_file)
+
+    concat_list = os.path.join(workdir, f"{base_name}_parts.txt")
+    with open(concat_list, "w", encoding="utf-8") as file:
+        file.writelines(f"file '{os.path.abspath(piece_file)}'\n" for piece_file in piece_files)
+
+    video_only = os.path.join(workdir, f"{base_name}_video.mp4")
+    run_ffmpeg(["-f", "concat", "-safe", "0", "-i", concat_list, "-c", "copy", "-tag:v", "avc3", video_only])
+
+    # Audio is cheap to encode, so cut it sample-accurately from the source
+    run_ffmpeg([
+        "-i", video_only, "-ss", f"{start_time:.6f}", "-t", f"{end_time - start_time:.6f}", "-i", video_path,
+        "-map", "0:v:0", "-map", "1:a:0?", "-c:v", "copy", "-tag:v", "avc3", "-c:a", "aac", "-shortest", output_file,
+    ])
+
+    for temp_file in piece_files + [concat_list, video_only]:
+        os.remove(temp_file)
+
+    try:
+        check_cut(output_file, bisect.bisect_left(frame_times, end_time) - bisect.bisect_left(frame_times, start_time))
+    except Exception:
+        os.remove(output_file)
+        raise
+
+    copied = sum(piece_end - piece_start for piece_start, piece_end, copy in pieces if copy)
+    print(f"⚡ Smart cut {output_file}: {copied:.1f}s stream-copied, {end_time - start_time - copied:.1f}s re-encoded")
+    return output_file
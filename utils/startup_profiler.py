@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+# Pipeline modules and the heavy libraries behind them, in pipeline order
+PROFILED_MODULES = [
+    "utils.youtube_downloader",
+    "yt_dlp",
+    "utils.transcriber",
+    "faster_whisper",
+    "utils.ai_processor",
+    "google.generativeai",
+    "utils.video_editor",
+    "moviepy.editor",
+    "utils.ai_voice_generator",
+    "TTS.api",
+    "utils.render_pool",
+]
+
+
+def measure_import_time(module):
+    """Cold import time of `module` in seconds, measured in a fresh interpreter, or None if it fails to import."""
+    code = (
+        "import importlib, time\n"
+        "start = time.perf_counter()\n"
+        f"importlib.import_module({module!r})\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def profile_startup(modules=PROFILED_MODULES):
+    """Prints the cold import time of each module and returns them as {module: seconds or None}."""
+    print("⏱️ Cold import time per module:")
+    timings = {}
+    for module in modules:
+        timings[module] = measure_import_time(module)
+        if timings[module] is None:
+            print(f"   {module:<28} failed to import")
+        else:
+            print(f"   {module:<28} {timings[module] * 1000:8.1f} ms")
+    return timings
@@ -0,0 +1,154 @@
+import bisect
+import math
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Subtitle look, matching the former ImageMagick TextClips
+FONT_SIZE = 70
+CAPTION_FONT_SIZE = 80
+SUBTITLE_MARGIN = 40
+SHADOW_COLOR = "black"
+SHADOW_OFFSET = (2, 2)
+OUTLINE_COLOR = "black"
+OUTLINE_WIDTH = 2
+LINE_SPACING = 4
+
+# Rendered sprites kept for reuse, least recently used first, capped by their total size
+SPRITE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_sprites = OrderedDict()
+_sprites_bytes = 0
+_sprites_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def load_font(font_path, font_size):
+    return ImageFont.truetype(font_path, font_size)
+
+
+def wrap_text(text, font, max_width):
+    """Greedy word wrap so no line is wider than `max_width` pixels (like TextClip's "caption" method)."""
+    lines = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}".strip()
+        if current and font.getlength(candidate) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return "\n".join(lines)
+
+
+def render_sprite(text, font_path, font_size, color, max_width):
+    """
+    Rasterizes one subtitle line with its outline and drop shadow baked into a single uint8 RGBA
+    sprite. Cached by text and style, so repeated lines (and re-renders) are only drawn once; the
+    cache drops the least recently used sprites past `SPRITE_CACHE_MAX_BYTES`.
+    """
+    global _sprites_bytes
+    key = (text, font_path, font_size, color, max_width)
+    with _sprites_lock:
+        sprite = _sprites.get(key)
+        if sprite is not None:
+            _sprites.move_to_end(key)
+            return sprite
+
+    sprite = draw_sprite(text, font_path, font_size, color, max_width)
+
+    with _sprites_lock:
+        if key not in _sprites:
+            _sprites[key] = sprite
+            _sprites_bytes += sprite.nbytes
+        while len(_sprites) > 1 and _sprites_bytes > SPRITE_CACHE_MAX_BYTES:
+            _, evicted = _sprites.popitem(last=False)
+            _sprites_bytes -= evicted.nbytes
+    return sprite
+
+
+def draw_sprite(text, font_path, font_size, color, max_width):
+    font = load_font(font_path, font_size)
+    wrapped = wrap_text(text, font, max_width)
+
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = measure.multiline_textbbox(
+        (0, 0), wrapped, font=font, spacing=LINE_SPACING, align="center", stroke_width=OUTLINE_WIDTH
+    )
+    left, top = math.floor(left), math.floor(top)
+    width = math.ceil(right) - left + SHADOW_OFFSET[0]
+    height = math.ceil(bottom) - top + SHADOW_OFFSET[1]
+
+    sprite = Image.new("RGBA", (max(width, 1), max(height, 1)), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+    origin = (-left, -top)
+    draw.multiline_text(
+        (origin[0] + SHADOW_OFFSET[0], origin[1] + SHADOW_OFFSET[1]), wrapped,
+        font=font, fill=SHADOW_COLOR, spacing=LINE_SPACING, align="center",
+    )
+    draw.multiline_text(
+        origin, wrapped, font=font, fill=color, spacing=LINE_SPACING, align="center",
+        stroke_width=OUTLINE_WIDTH, stroke_fill=OUTLINE_COLOR,
+    )
+    return np.asarray(sprite)
+
+
+def blend_sprite(frame, sprite, x, y):
+    """
+    Alpha-blends the RGBA `sprite` onto a copy of `frame` with its top-left corner at (x, y),
+    clipped to the frame. Integer math with rounding, only over the covered region.
+    """
+    height, width = sprite.shape[:2]
+
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + width, frame.shape[1]), min(y + height, frame.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return frame
+
+    sx, sy = x0 - x, y0 - y
+    visible = sprite[sy:sy + y1 - y0, sx:sx + x1 - x0]
+    rgb = visible[:, :, :3].astype(np.uint16)
+    alpha = visible[:, :, 3:4].astype(np.uint16)
+
+    output = frame.copy()
+    region = output[y0:y1, x0:x1, :3]
+    region[:] = (rgb * alpha + region * (255 - alpha) + 127) // 255
+    return output
+
+
+class SubtitleTrack:
+    """
+    Pre-rasterized subtitle lines of one clip, indexed by start time.
+
+    The active line at time t is found with a binary search over the sorted start times, so the
+    per-frame cost doesn't grow with the number of lines.
+    """
+
+    def __init__(self, transcript, frame_size, font_path, color, font_size=FONT_SIZE):
+        frame_width, frame_height = frame_size
+        max_width = frame_width - 2 * SUBTITLE_MARGIN
+
+        lines = sorted(transcript, key=lambda line: line["start"])
+        self.starts = [line["start"] for line in lines]
+        self.ends = [line["end"] for line in lines]
+        self.sprites = [render_sprite(line["text"], font_path, font_size, color, max_width) for line in lines]
+
+        # Centered horizontally, top edge at the middle of the frame
+        self.positions = [((frame_width - sprite.shape[1]) // 2, frame_height // 2) for sprite in self.sprites]
+
+    def active_line(self, t):
+        """Index of the line shown at `t` (the latest one started), or None."""
+        idx = bisect.bisect_right(self.starts, t) - 1
+        if idx >= 0 and t < self.ends[idx]:
+            return idx
+        return None
+
+    def draw(self, frame, t):
+        idx = self.active_line(t)
+        if idx is None:
+            return frame
+        x, y = self.positions[idx]
+        return blend_sprite(frame, self.sprites[idx], x, y)
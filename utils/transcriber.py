@@ -1,20 +1,94 @@
-from faster_whisper import WhisperModel
 from utils.config_loader import load_config
+from utils.model_registry import get_model
+from utils.instrumentation import instrument
+from utils.transcript_store import TranscriptBuilder
 
-def transcribe_audio(video_path):
-    print(f"📝 Transcribing {video_path} using WhisperModel (CPU)...")
+# Approximate float32 weight size of each Whisper model, in MB
+WHISPER_MODEL_SIZES_MB = {
+    "tiny": 150,
+    "base": 290,
+    "small": 970,
+    "medium": 3060,
+    "large-v2": 6170,
+    "large-v3": 6170,
+}
+COMPUTE_TYPE_BYTES = {"int8": 1, "int8_float16": 1, "int8_float32": 1, "float16": 2, "float32": 4}
 
+def get_whisper_model(config):
+    """Returns the process-wide Whisper model for the configured size / compute type, loading it once."""
+    model_size = config.get("whisper_model_size", "small")
+    device = config.get("whisper_device", "cpu")
+    compute_type = config.get("whisper_compute_type", "int8")
+    cpu_threads = config.get("whisper_cpu_threads", 0)  # 0 lets CTranslate2 pick
+    num_workers = config.get("whisper_num_workers", 1)
+
+    size_mb = WHISPER_MODEL_SIZES_MB.get(model_size, 1000) * COMPUTE_TYPE_BYTES.get(compute_type, 4) // 4
+
+    def load():
+        from faster_whisper import WhisperModel
+        return WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads, num_workers=num_workers)
+
+    return get_model(
+        ("whisper", model_size, device, compute_type, cpu_threads, num_workers),
+        load,
+        size_mb=size_mb,
+        max_total_mb=config.get("model_cache_max_mb"),
+        idle_seconds=config.get("model_idle_seconds"),
+    )
+
+@instrument()
+def transcribe_audio(video_path, transcript_file="temp/transcript.txt", audio=None, words_file=None):
+    """
+    Transcribes `video_path` into word-chunked transcript entries.
+
+    `audio` can be the source's 16 kHz mono float32 samples (see `audio_pipeline.load_pcm`);
+    Whisper then skips decoding the container itself. The word timestamps are kept in a
+    `TranscriptStore`, saved to `words_file` when given, and the entries are derived from it.
+    """
+    config = load_config()
+    builder = TranscriptBuilder()
+    _, entries = stream_transcript(video_path, audio, builder=builder)
+    for _ in entries:
+        pass  # Drain the segments into the builder
+
+    store = builder.build()
+    transcript_data = store.entries(config["max_words_per_segment"])
+    if words_file:
+        store.save(words_file)
+
+    # ✅ Save transcript with timestamps to a file
+    if transcript_file:
+        save_transcript(transcript_data, transcript_file)
+
+    return transcript_data  # Returns list of timestamps + text
+
+def stream_transcript(video_path, audio=None, builder=None):
+    """
+    Starts transcribing and returns `(duration, entries)`, where `entries` is a generator that
+    yields each transcript entry as soon as Whisper has decoded its segment.
+
+    Every decoded segment is also added to `builder` (a `TranscriptBuilder`) when one is given.
+    """
     config = load_config()
     max_words_per_segment = config["max_words_per_segment"]
 
-    # Load the Whisper model
-    model = WhisperModel("small", device="cpu", compute_type="int8")  # Optimized for CPU
-    segments, word_timestamps = model.transcribe(video_path, word_timestamps=True)  # Request word-level timestamps
+    print(f"📝 Transcribing {video_path} using WhisperModel ({config.get('whisper_model_size', 'small')})...")
 
-    # ✅ Store transcript with timestamps
-    transcript_data = []
-    transcript_text = ""
+    # Reuse the warm Whisper model for this configuration
+    model = get_whisper_model(config)
+    segments, info = model.transcribe(audio if audio is not None else video_path, word_timestamps=True)  # Request word-level timestamps
 
+    if builder is not None:
+        segments = record_segments(segments, builder)
+    return info.duration, split_segments(segments, max_words_per_segment)
+
+def record_segments(segments, builder):
+    for segment in segments:
+        builder.add_segment(segment)
+        yield segment
+
+def split_segments(segments, max_words_per_segment):
+    """Yields `{"start", "end", "text"}` entries of at most `max_words_per_segment` words."""
     for segment in segments:
         start = segment.start
         end = segment.end
@@ -33,8 +107,7 @@ def transcribe_audio(video_path):
             # When we reach the max number of words, save the current chunk
             if len(current_words) >= max_words_per_segment:
                 chunk_end = word_end
-                transcript_data.append({"start": current_start, "end": chunk_end, "text": " ".join(current_words)})
-                transcript_text += f"[{current_start:.2f} - {chunk_end:.2f}] {' '.join(current_words)}\n"
+                yield {"start": current_start, "end": chunk_end, "text": " ".join(current_words)}
                 
                 # Reset for next chunk
                 current_words = []
@@ -43,13 +116,37 @@ def transcribe_audio(video_path):
         # Add any remaining words as a final chunk
         if current_words:
             chunk_end = word_end
-            transcript_data.append({"start": current_start, "end": chunk_end, "text": " ".join(current_words)})
-            transcript_text += f"[{current_start:.2f} - {chunk_end:.2f}] {' '.join(current_words)}\n"
+            yield {"start": current_start, "end": chunk_end, "text": " ".join(current_words)}
 
-    # ✅ Save transcript with timestamps to a file
-    transcript_file = "temp/transcript.txt"
+def save_transcript(transcript_data, transcript_file):
+    """Writes the transcript as `[start - end] text` lines."""
+    transcript_text = "".join(
+        f"[{entry['start']:.2f} - {entry['end']:.2f}] {entry['text']}\n" for entry in transcript_data
+    )
     with open(transcript_file, "w", encoding="utf-8") as file:
         file.write(transcript_text)
-
     print(f"📄 Transcript saved to {transcript_file}")
-    return transcript_data  # Returns list of timestamps + text
+
+def slice_transcript(transcript_data, start_time, end_time):
+    """
+    Returns the transcript entries inside [start_time, end_time], with times shifted
+    so that start_time becomes 0 (clip-relative).
+
+    Entries that straddle the window are clamped to its edges.
+    """
+    start_time = float(start_time)
+    end_time = float(end_time)
+    clip_transcript = []
+
+    for entry in transcript_data:
+        if entry["end"] <= start_time or entry["start"] >= end_time:
+            continue
+
+        clip_transcript.append({
+            "start": max(entry["start"], start_time) - start_time,
+            "end": min(entry["end"], end_time) - start_time,
+            "text": entry["text"],
+        })
+
+    return clip_transcript
+
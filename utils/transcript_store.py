@@ -0,0 +1,210 @@
+import struct
+import zipfile
+import numpy as np
+
+# Size of the fixed part of a zip local file header, and where its name/extra lengths sit
+ZIP_LOCAL_HEADER_SIZE = 30
+ZIP_NAME_LENGTHS_OFFSET = 26
+
+
+class TranscriptBuilder:
+    """Collects Whisper segments (with their word timestamps) while they are decoded."""
+
+    def __init__(self):
+        self.word_starts = []
+        self.word_ends = []
+        self.words = []
+        self.segment_starts = []
+        self.segment_first_words = []
+
+    def add_segment(self, segment):
+        self.segment_starts.append(segment.start)
+        self.segment_first_words.append(len(self.words))
+        for word_info in segment.words:
+            self.words.append(word_info.word)
+            self.word_starts.append(word_info.start)
+            self.word_ends.append(word_info.end)
+
+    def build(self):
+        return TranscriptStore.from_words(
+            self.words, self.word_starts, self.word_ends, self.segment_starts, self.segment_first_words
+        )
+
+
+class TranscriptStore:
+    """
+    Columnar word-level transcript: word start/end times as float32 arrays, and the words as one
+    UTF-8 blob (joined by single spaces) with byte offsets, so the text of any run of consecutive
+    words is a single slice. Whisper segment boundaries are kept so the transcript can be
+    re-segmented to any `max_words_per_segment` without running ASR again.
+
+    Saved as an uncompressed `.npz` whose arrays are memory-mapped on load, so opening the words of
+    a multi-hour source costs no parsing; time range queries use binary search over the sorted times.
+    """
+
+    def __init__(self, word_starts, word_ends, offsets, blob, segment_starts, segment_first_words):
+        self.word_starts = word_starts
+        self.word_ends = word_ends
+        self.offsets = offsets
+        self.blob = blob
+        self.segment_starts = segment_starts
+        self.segment_first_words = segment_first_words
+        self._segmentations = {}
+
+    @classmethod
+    def from_words(cls, words, word_starts, word_ends, segment_starts, segment_first_words):
+        encoded = [word.encode("utf-8") for word in words]
+        # offsets[i] is where word i starts; each word is followed by one separator byte
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(word) + 1 for word in encoded], out=offsets[1:])
+
+        return cls(
+            np.asarray(word_starts, dtype=np.float32),
+            np.asarray(word_ends, dtype=np.float32),
+            offsets,
+            np.frombuffer(b" ".join(encoded) + b" ", dtype=np.uint8),
+            np.asarray(segment_starts, dtype=np.float32),
+            np.asarray(segment_first_words, dtype=np.int64),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = mmap_npz(path)
+        return cls(
+            data["word_starts"], data["word_ends"], data["offsets"], data["blob"],
+            data["segment_starts"], data["segment_first_words"],
+        )
+
+    def save(self, path):
+        """Writes the store to `path` (a `.npz`); returns the path."""
+        with open(path, "wb") as file:
+            np.savez(
+                file,
+                word_starts=self.word_starts, word_ends=self.word_ends, offsets=self.offsets, blob=self.blob,
+                segment_starts=self.segment_starts, segment_first_words=self.segment_first_words,
+            )
+        return path
+
+    def __len__(self):
+        return len(self.word_starts)
+
+    @property
+    def duration(self):
+        return float(self.word_ends[-1]) if len(self) else 0.0
+
+    def text(self, first_word, end_word):
+        """Text of words `first_word` .. `end_word - 1`, joined by single spaces."""
+        if end_word <= first_word:
+            return ""
+        return self.blob[self.offsets[first_word]:self.offsets[end_word] - 1].tobytes().decode("utf-8")
+
+    def word_range(self, start_time, end_time):
+        """Indices `(first, end)` of the words overlapping [start_time, end_time), found by binary search."""
+        first = int(np.searchsorted(self.word_ends, start_time, side="right"))
+        end = int(np.searchsorted(self.word_starts, end_time, side="left"))
+        return first, max(first, end)
+
+    def segmentation(self, max_words_per_segment):
+        """
+        Entry arrays `(starts, ends, first_words, end_words)` for `max_words_per_segment`, computed
+        with NumPy and cached. Matches `split_segments`: each Whisper segment is cut every
+        `max_words_per_segment` words; its first entry starts at the segment start and later ones at
+        the end of the previous entry.
+        """
+        if max_words_per_segment in self._segmentations:
+            return self._segmentations[max_words_per_segment]
+
+        segment_ends = np.append(self.segment_first_words[1:], len(self))
+        word_counts = segment_ends - self.segment_first_words
+        entry_counts = -(-word_counts // max_words_per_segment)  # ceil; segments without words give no entry
+
+        segment_of_entry = np.repeat(np.arange(len(word_counts)), entry_counts)
+        entry_in_segment = np.arange(entry_counts.sum()) - np.repeat(np.cumsum(entry_counts) - entry_counts, entry_counts)
+
+        first_words = self.segment_first_words[segment_of_entry] + entry_in_segment * max_words_per_segment
+        end_words = np.minimum(first_words + max_words_per_segment, segment_ends[segment_of_entry])
+
+        ends = self.word_ends[end_words - 1] if len(end_words) else np.zeros(0, dtype=np.float32)
+        starts = np.where(
+            entry_in_segment == 0,
+            self.segment_starts[segment_of_entry],
+            self.word_ends[np.maximum(first_words - 1, 0)],
+        ).astype(np.float32)
+
+        self._segmentations[max_words_per_segment] = (starts, ends, first_words, end_words)
+        return self._segmentations[max_words_per_segment]
+
+    def entries(self, max_words_per_segment, start_time=None, end_time=None, relative=False, with_words=False):
+        """
+        Transcript entries `{"start", "end", "text"}` of at most `max_words_per_segment` words.
+
+        With a time window only the entries overlapping it are built (located by binary search) and
+        clamped to it; `relative` shifts them so `start_time` becomes 0, like `slice_transcript`.
+        `with_words` adds each entry's `"words"` with their own timestamps (e.g. for karaoke subtitles).
+        """
+        starts, ends, first_words, end_words = self.segmentation(max_words_per_segment)
+
+        low, high = 0, len(starts)
+        if start_time is not None:
+            low = int(np.searchsorted(ends, start_time, side="right"))
+        if end_time is not None:
+            high = int(np.searchsorted(starts, end_time, side="left"))
+
+        window_start = float(start_time) if start_time is not None else float("-inf")
+        window_end = float(end_time) if end_time is not None else float("inf")
+        shift = float(start_time) if relative and start_time is not None else 0.0
+
+        entries = []
+        for idx in range(low, high):
+            if ends[idx] <= window_start or starts[idx] >= window_end:
+                continue
+
+            entry = {
+                "start": max(float(starts[idx]), window_start) - shift,
+                "end": min(float(ends[idx]), window_end) - shift,
+                "text": self.text(first_words[idx], end_words[idx]),
+            }
+            if with_words:
+                entry["words"] = [
+                    {
+                        "word": self.text(word, word + 1),
+                        "start": float(self.word_starts[word]) - shift,
+                        "end": float(self.word_ends[word]) - shift,
+                    }
+                    for word in range(first_words[idx], end_words[idx])
+                ]
+            entries.append(entry)
+
+        return entries
+
+
+def mmap_npz(path):
+    """
+    Memory-maps every array of an uncompressed `.npz` (as written by `np.savez`) read-only.
+    `np.load` can only memory-map plain `.npy` files, so this finds each member's data in the zip.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as raw:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} is compressed and can't be memory-mapped.")
+
+            with archive.open(info) as member:
+                version = np.lib.format.read_magic(member)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(member)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(member)
+                npy_header_size = member.tell()
+
+            raw.seek(info.header_offset + ZIP_NAME_LENGTHS_OFFSET)
+            name_length, extra_length = struct.unpack("<HH", raw.read(4))
+            offset = info.header_offset + ZIP_LOCAL_HEADER_SIZE + name_length + extra_length + npy_header_size
+
+            name = info.filename[:-len(".npy")]
+            if np.prod(shape) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)  # mmap can't map zero bytes
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
@@ -1,29 +1,69 @@
-from moviepy.editor import VideoFileClip, CompositeVideoClip, TextClip, concatenate_audioclips, concatenate_videoclips, AudioFileClip, CompositeAudioClip
-from PIL import Image, ImageFilter
-import numpy as np
+from moviepy.editor import VideoFileClip, CompositeVideoClip, ImageClip, concatenate_audioclips, concatenate_videoclips, AudioFileClip, CompositeAudioClip
 import os
 from utils.transcriber import transcribe_audio
 from utils.config_loader import load_config
 from datetime import datetime
 from constants import FORMAT_ONE, FORMAT_TWO
 from utils.file_utils import save_clip_metadata
-import random
+from utils.smart_cut import probe_frame_times, probe_video_stream, smart_cut
+from utils.multi_output import extract_moments_single_pass
+from utils.ai_voice_generator import resolve_voice
+from utils.instrumentation import instrument, span
+from utils.subtitle_renderer import SubtitleTrack, render_sprite, blend_sprite, CAPTION_FONT_SIZE
+from utils.frame_blur import FrameBlur
+from utils.filler_pool import prepare_filler_pool, pick_filler
+from utils.ass_subtitles import write_ass_file, ass_filter, burn_subtitles
+
+@instrument()
+def trim_video(video_path, moments, output_dir="temp", threads=None):
+    """Cuts each moment into its own clip. `trim_mode` picks a full re-encode (default), "smart" or "single_pass"."""
+    config = load_config()
+
+    # Single pass: decode the source once front to back and feed every moment's encoder
+    if config.get("trim_mode") == "single_pass":
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        clips = [f"{output_dir}/{moment['video_title']}_{timestamp}.mp4" for moment in moments]
+        extract_moments_single_pass(video_path, moments, clips, threads=threads)
+
+        for moment in moments:
+            save_clip_metadata(moment, f"{moment['video_title']}_{timestamp}.json")
+        return clips
 
-def trim_video(video_path, moments):
     clips = []
     video = VideoFileClip(video_path)
 
+    # Smart cut: stream-copy whole GOPs and only re-encode the partial GOPs at the cut points
+    keyframes = frame_times = stream_info = None
+    if config.get("trim_mode") == "smart":
+        try:
+            stream_info = probe_video_stream(video_path)
+            if stream_info["codec_name"] == "h264":
+                keyframes, frame_times = probe_frame_times(video_path)
+            else:
+                print(f"⚠️ Smart cut needs an H.264 source (got {stream_info['codec_name']}), re-encoding instead.")
+        except Exception as e:
+            print(f"⚠️ Could not probe keyframes ({e}), re-encoding instead.")
+
     for i, moment in enumerate(moments):
         start_time = float(moment["start"])
         end_time = float(moment["end"])
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         video_title = moment['video_title']
-        output_file = f"temp/{video_title}_{timestamp}.mp4"
+        output_file = f"{output_dir}/{video_title}_{timestamp}.mp4"
         print(f"✂️ Cutting {output_file}: {moment['caption']} ({moment['start']} - {moment['end']})")
         
-        clip = video.subclip(start_time, end_time)
-        clip.write_videofile(output_file, codec="libx264", audio_codec="aac")
+        cut = False
+        if keyframes:
+            try:
+                smart_cut(video_path, start_time, end_time, output_file, keyframes, frame_times, stream_info, output_dir)
+                cut = True
+            except Exception as e:
+                print(f"⚠️ Smart cut failed ({e}), re-encoding instead.")
+
+        if not cut:
+            clip = video.subclip(start_time, end_time)
+            clip.write_videofile(output_file, codec="libx264", audio_codec="aac", threads=threads)
         clips.append(output_file)
 
         save_clip_metadata(moment, f"{video_title}_{timestamp}.json")
@@ -31,20 +71,40 @@ def trim_video(video_path, moments):
     video.close()
     return clips
 
-def format_for_youtube_reels(input_video, output_video):
+def format_for_youtube_reels(input_video, output_video, threads=None, filler_pool=None):
     """Create Short Video"""
     config = load_config()
     video_type = config["video_type"]
     if video_type == FORMAT_ONE:
-        reel_format_one(input_video=input_video, output_video=output_video)
+        reel_format_one(input_video=input_video, output_video=output_video, threads=threads)
+    elif video_type == FORMAT_TWO:
+        reel_format_two(input_video=input_video, output_video=output_video, threads=threads, filler_pool=filler_pool)
+
+def build_reel_layout(clip, video_type, filler_pool=None):
+    """
+    Returns `(layout, opened_clips)`: `clip` laid out in the configured reel format without encoding
+    it, and the extra clips the layout opened (the game filler), to close once the layout is written.
+    `filler_pool` is the prepared pool of game fillers (see `layout_format_two`).
+    """
+    if video_type == FORMAT_ONE:
+        return layout_format_one(clip), []
     elif video_type == FORMAT_TWO:
-        reel_format_two(input_video=input_video, output_video=output_video)
+        layout, filler_clip = layout_format_two(clip, filler_pool)
+        return layout, [filler_clip]
+    raise ValueError(f"Unknown video_type: {video_type}")
 
-def reel_format_one(input_video, output_video):
+def reel_format_one(input_video, output_video, threads=None):
     """Convert video to vertical (1080x1920) format for YouTube Reels without stretching the video.
        Optionally plays a short audio caption at the start along with the original audio.
     """
     clip = VideoFileClip(input_video)
+    final_clip = layout_format_one(clip)
+
+    # Save final output
+    final_clip.write_videofile(output_video, codec='libx264', audio_codec='aac', fps=clip.fps, threads=threads)
+
+def layout_format_one(clip):
+    """Centers `clip` on a 1080x1920 black canvas (format one)."""
     original_width, original_height = clip.size
 
     # Resize the video to fit within a square (1080x1080) while maintaining aspect ratio
@@ -55,18 +115,30 @@ def reel_format_one(input_video, output_video):
     clip_resized = clip.resize(newsize=(new_width, new_height))
 
     # Set the final video size to 1080x1920 and center the video with black bars
-    final_clip = clip_resized.on_color(size=(1080, 1920), color=(0, 0, 0), pos='center')
-
-    # Save final output
-    final_clip.write_videofile(output_video, codec='libx264', audio_codec='aac', fps=clip.fps)
+    return clip_resized.on_color(size=(1080, 1920), color=(0, 0, 0), pos='center')
 
-def reel_format_two(input_video, output_video):
+def reel_format_two(input_video, output_video, threads=None, filler_pool=None):
     """Formats the video for YouTube Reels with the top half as the main video and the bottom half as a game filler,
        ensuring correct aspect ratio without stretching or black bars. Optionally overlays a short caption audio at start.
     """
 
     # Load main video
     main_clip = VideoFileClip(input_video)
+    final_clip, filler_clip = layout_format_two(main_clip, filler_pool)
+
+    # Save final output
+    final_clip.write_videofile(output_video, codec='libx264', audio_codec='aac', fps=main_clip.fps, threads=threads)
+    filler_clip.close()
+    main_clip.close()
+
+def layout_format_two(main_clip, filler_pool=None):
+    """
+    Stacks `main_clip` (top half) over a random game filler (bottom half) on a 1080x1920 canvas (format two).
+    Returns the layout and the opened filler clip, which the caller closes after writing.
+
+    `filler_pool` is the pool returned by `prepare_filler_pool`; renderers prepare it once per job and
+    pass it down, so the filler folder isn't listed (or re-normalized) for every clip.
+    """
     original_width, original_height = main_clip.size
 
     # Resize main video so height is 960 (top half), then center-crop width to 1080
@@ -87,210 +159,253 @@ def reel_format_two(input_video, output_video):
         # If it's narrower, add black bars (not recommended, but fallback)
         main_clip_resized = main_clip_resized.resize(width=1080)
 
-    # Locate filler video
-    filler_folder = "video_fillers"
-    filler_videos = [f for f in os.listdir(filler_folder) if f.endswith(('.mp4', '.mov', '.avi'))]
-
-    if not filler_videos:
-        raise FileNotFoundError("No filler video found in the 'video_fillers' directory.")
-
-    filler_path = os.path.join(filler_folder, random.choice(filler_videos))
-    filler_clip = VideoFileClip(filler_path).subclip(0, min(main_clip.duration, VideoFileClip(filler_path).duration))
-
-    # Resize filler only if it's narrower than 1080px
-    filler_width, filler_height = filler_clip.size
-    if filler_width < 1080:
-        scale_factor = 1080 / filler_width
-        filler_clip = filler_clip.resize(width=1080, height=int(filler_height * scale_factor))
-
-    # Crop starting from 5% above the bottom
-    filler_width, filler_height = filler_clip.size
-    y1 = max(0, filler_height - 960 - int(filler_height * 0.15))
-    y2 = y1 + 960
-    filler_clip_cropped = filler_clip.crop(x1=0, x2=1080, y1=y1, y2=y2)
+    # Fillers are pre-normalized to exactly 1080x960 (resized and cropped), so they're streamed as-is
+    if filler_pool is None:
+        filler_pool = prepare_filler_pool(load_config())
+    filler = pick_filler(filler_pool, main_clip.duration)
+    filler_source = VideoFileClip(filler["path"])
+    filler_clip = filler_source.subclip(0, min(main_clip.duration, filler_source.duration))
 
     # Position the clips
     main_clip_positioned = main_clip_resized.set_position((0, 0))
-    filler_clip_positioned = filler_clip_cropped.set_position((0, 960))
+    filler_clip_positioned = filler_clip.set_position((0, 960))
 
     # Combine into a single vertical video
-    final_clip = CompositeVideoClip(
+    layout = CompositeVideoClip(
         [main_clip_positioned, filler_clip_positioned],
         size=(1080, 1920),
         bg_color=(0, 0, 0)
     )
+    return layout, filler_source
 
-    # Save final output
-    final_clip.write_videofile(output_video, codec='libx264', audio_codec='aac', fps=main_clip.fps)
 
+def subtitle_transcript(input_video, relevant_transcript, config):
+    """The transcript to subtitle `input_video` with, re-transcribing it only if allowed and none is given."""
+    if relevant_transcript is None:
+        if not config.get("retranscribe_subtitles", False):
+            raise ValueError("No transcript given for subtitles and 'retranscribe_subtitles' is disabled.")
 
-def add_subtitles(input_video, output_video):
-    """Overlay subtitles from relevant transcript onto video, centered on screen with custom font."""
-    print(f"🎬 Loading video: {input_video}")
-    clip = VideoFileClip(input_video)
-    print(f"✅ Video loaded. Duration: {clip.duration}s, Resolution: {clip.w}x{clip.h}, FPS: {clip.fps}")
-
-    print("🧠 Transcribing audio...")
-    relevant_transcript = transcribe_audio(input_video)  # Replace with your actual transcription function
-    print(f"📝 Transcription complete. Found {len(relevant_transcript)} lines.")
+        print("🧠 Transcribing audio...")
+        relevant_transcript = transcribe_audio(input_video, transcript_file=None)
+        print(f"📝 Transcription complete. Found {len(relevant_transcript)} lines.")
+    else:
+        print(f"📝 Using source transcript. Found {len(relevant_transcript)} lines.")
 
-    fps = clip.fps
-    subtitle_clips = []
+    return relevant_transcript
 
-    # Subtitle settings
-    print("⚙️ Loading subtitle configuration...")
-    config = load_config()
-    font_path = config["font_path"]
-    text_color = config["subtitle_color"]
-    font_size = 70
-    subtitle_margin = 40
-    shadow_color = 'black'
-    shadow_offset = (2, 2)
-    outline_color = "black"
-    outline_width = 2
-    position = ('center', 'center')
-    print(f"🎨 Font loaded: {font_path}")
+def ass_encode_params(output_video, frame_size, config, transcript=None, caption=None, voice_caption=None):
+    """
+    ffmpeg output parameters burning the subtitles and caption intro text in with libass during
+    the final encode (`subtitle_backend` "ass"). The .ass file is written next to `output_video`.
+    """
+    caption_duration = 0
+    if voice_caption is not None:
+        caption_audio = AudioFileClip(voice_caption)
+        caption_duration = caption_audio.duration
+        caption_audio.close()
 
-    subtitle_height = 100
-    vertical_position = clip.h - subtitle_height - subtitle_margin
+    ass_file = write_ass_file(os.path.splitext(output_video)[0] + ".ass", frame_size, config, transcript, caption, caption_duration)
+    return ["-vf", ass_filter(ass_file, config)]
 
-    vertical_position_offset = position[1]
+def add_subtitles(input_video, output_video, relevant_transcript=None, threads=None):
+    """Overlay subtitles from relevant transcript onto video, centered on screen with custom font.
 
-    if vertical_position_offset == 'bottom':
-        vertical_position = clip.h - subtitle_height - subtitle_margin
-    elif vertical_position_offset == 'top':
-        vertical_position = subtitle_margin
-    else:
-        vertical_position = clip.h // 2
-
-    print("🧱 Building subtitle clips...")
-
-    for idx, line in enumerate(relevant_transcript):
-        start_time = line["start"]
-        end_time = line["end"]
-        duration = end_time - start_time
-        text = line["text"]
-
-        print(f"🕒 Subtitle {idx+1}/{len(relevant_transcript)}: {start_time}s to {end_time}s — '{text}'")
-
-        # Create subtitle text clip
-        subtitle = TextClip(
-            text,
-            fontsize=font_size,
-            color=text_color,
-            font=font_path,
-            size=(clip.w - 2 * subtitle_margin, None),
-            method="caption",
-            stroke_width=outline_width, 
-            stroke_color=outline_color
-        )
+    `relevant_transcript` is the clip-relative slice of the source transcript (see `slice_transcript`).
+    The clip is only re-transcribed when no transcript is given and `retranscribe_subtitles` is enabled.
+    """
+    config = load_config()
+    relevant_transcript = subtitle_transcript(input_video, relevant_transcript, config)
 
-        # Create shadow text clip
-        shadow = TextClip(
-            text,
-            fontsize=font_size,
-            color=shadow_color,
-            font=font_path,
-            size=(clip.w - 2 * subtitle_margin, None),
-            method="caption"
-        )
+    if config.get("subtitle_backend") == "ass":
+        # libass draws the subtitles inside the ffmpeg encode; no frames pass through Python
+        stream = probe_video_stream(input_video)
+        ass_file = write_ass_file(os.path.splitext(output_video)[0] + ".ass", (stream["width"], stream["height"]), config, relevant_transcript)
+        print(f"💾 Burning {ass_file} into {output_video}...")
+        burn_subtitles(input_video, ass_file, output_video, config, threads=threads)
+        print(f"✅ Done! Final video saved to {output_video}")
+        return
 
-        # Determine numeric center for outlines and shadows
-        text_width = clip.w - 2 * subtitle_margin
-        horizontal_center = (clip.w - text_width) // 2
+    print(f"🎬 Loading video: {input_video}")
+    clip = VideoFileClip(input_video)
+    print(f"✅ Video loaded. Duration: {clip.duration}s, Resolution: {clip.w}x{clip.h}, FPS: {clip.fps}")
 
-        # Shadow
-        shadow = shadow.set_position((horizontal_center + shadow_offset[0], vertical_position + shadow_offset[1])) \
-                    .set_duration(duration).set_start(start_time)
+    fps = clip.fps
+    final = overlay_subtitles(clip, relevant_transcript, config)
 
-        # Subtitle stays centered
-        subtitle = subtitle.set_position(('center', vertical_position)) \
-                        .set_duration(duration).set_start(start_time)
+    print(f"💾 Exporting final video to {output_video}...")
+    final.write_videofile(output_video, codec='libx264', audio_codec='aac', fps=fps, threads=threads)
 
-        subtitle_clips.append(shadow)
-        subtitle_clips.append(subtitle)
+    print(f"✅ Done! Final video saved to {output_video}")
 
-    print("🧩 Combining video and subtitles...")
-    final = CompositeVideoClip([clip] + subtitle_clips)
+def overlay_subtitles(clip, relevant_transcript, config):
+    """
+    Returns `clip` with the clip-relative transcript drawn on top, without encoding it.
 
-    print(f"💾 Exporting final video to {output_video}...")
-    final.write_videofile(output_video, codec='libx264', audio_codec='aac', fps=fps)
+    Lines are rasterized once with Pillow (outline and shadow baked into one sprite) and
+    alpha-blended onto each frame, instead of compositing two ImageMagick TextClips per line.
+    """
+    font_path = config["font_path"]
+    print(f"🎨 Font loaded: {font_path}")
+    print(f"🧱 Rasterizing {len(relevant_transcript)} subtitle lines...")
+    track = SubtitleTrack(relevant_transcript, clip.size, font_path, config["subtitle_color"])
 
-    print(f"✅ Done! Final video saved to {output_video}")
+    return clip.fl(lambda get_frame, t: track.draw(get_frame(t), t))
 
 def apply_gaussian_blur(clip, sigma=5):
-    """Apply a Gaussian blur effect to a video clip using Pillow."""
-    def blur_frame(get_frame, t):
-        frame = get_frame(t)  # Extract the frame at time t
-        pil_frame = Image.fromarray(frame)  # Convert to PIL image
-        pil_frame = pil_frame.filter(ImageFilter.GaussianBlur(radius=sigma))  # Apply blur
-        return np.array(pil_frame)  # Convert back to numpy array for MoviePy
+    """Apply a Gaussian blur effect to a video clip (downsample, blur, upsample; see `FrameBlur`)."""
+    return clip.fl_image(FrameBlur(sigma=sigma))  # Apply the blur to each frame
 
-    return clip.fl(blur_frame)  # Apply the function to each fram
-
-def process_video(input_video, output_video, voice_caption, caption):
+@instrument()
+def process_video(input_video, output_video, voice_caption, caption, transcript=None, workdir="temp", threads=None, filler_pool=None):
     config = load_config()
     subtitles = config["add_subtitles"]
+    use_ass = config.get("subtitle_backend") == "ass"
 
-    temp1 = "temp/temp_resized.mp4"
-    temp2 = "temp/temp_subtitled.mp4"
+    temp1 = os.path.join(workdir, "temp_resized.mp4")
+    temp2 = os.path.join(workdir, "temp_subtitled.mp4")
     
     # Format video to vertical
-    format_for_youtube_reels(input_video, temp1)
+    format_for_youtube_reels(input_video, temp1, threads=threads, filler_pool=filler_pool)
 
-    # Decide which video to load based on subtitle flag
-    if subtitles:
-        add_subtitles(temp1, temp2)
+    # Decide which video to load based on subtitle flag; with libass they're burned in during the final encode
+    if subtitles and not use_ass:
+        add_subtitles(temp1, temp2, transcript, threads=threads)
         video_path = temp2
     else:
         video_path = temp1
 
     final_clip = VideoFileClip(video_path)
 
+    ffmpeg_params = None
+    if use_ass:
+        subtitle_lines = subtitle_transcript(temp1, transcript, config) if subtitles else None
+        ffmpeg_params = ass_encode_params(output_video, final_clip.size, config, subtitle_lines, caption, voice_caption)
+
     # Handle optional caption audio
     if voice_caption is not None:
-        caption_audio = AudioFileClip(voice_caption)
+        final_clip = add_caption_intro(final_clip, voice_caption, caption, config, draw_caption=not use_ass)
 
-        # Mute original audio during caption if needed
-        caption_duration = caption_audio.duration
-        original_audio = final_clip.audio
+    # Export final video
+    with span("encode_final", output=output_video, frames=int(final_clip.duration * 30)):
+        final_clip.write_videofile(output_video, codec='libx264', audio_codec='aac', fps=30, threads=threads, ffmpeg_params=ffmpeg_params)
+    final_clip.close()
+    print(f"✅ Final processed video saved as {output_video}")
 
-        muted_part = original_audio.subclip(0, caption_duration).volumex(0)
-        rest_part = original_audio.subclip(caption_duration)
-        adjusted_original = concatenate_audioclips([muted_part, rest_part])
+def add_caption_intro(final_clip, voice_caption, caption, config, draw_caption=True):
+    """
+    Plays the AI voice caption over a blurred intro with the caption text, muting the original audio meanwhile.
 
-        # Combine caption voice and adjusted original audio
-        final_audio = CompositeAudioClip([adjusted_original, caption_audio.set_start(0)])
-        final_clip = final_clip.set_audio(final_audio)
+    `caption_intro_mode` "freeze" blurs the first frame once and holds it for the caption instead of
+    blurring every intro frame. With `draw_caption` off only the audio and blur are applied (the text
+    is burned in by libass instead).
+    """
+    caption_audio = AudioFileClip(voice_caption)
 
-        # Blur the video during the AI speaking portion
-        blur_duration = caption_duration
-        blur_clip = final_clip.subclip(0, blur_duration)
-        blur_clip = apply_gaussian_blur(blur_clip, sigma=5)
+    # Mute original audio during caption if needed
+    caption_duration = min(caption_audio.duration, final_clip.duration)
+    original_audio = final_clip.audio
 
-        # Get the portion after AI voice
-        after_blur_clip = final_clip.subclip(blur_duration)
+    muted_part = original_audio.subclip(0, caption_duration).volumex(0)
+    rest_part = original_audio.subclip(caption_duration)
+    adjusted_original = concatenate_audioclips([muted_part, rest_part])
 
-        # Combine blurred part and rest of the video
-        final_clip = concatenate_videoclips([blur_clip, after_blur_clip])
+    # Combine caption voice and adjusted original audio
+    final_audio = CompositeAudioClip([adjusted_original, caption_audio.set_start(0)])
+    final_clip = final_clip.set_audio(final_audio)
 
-        config = load_config()
-        font_path = config["font_path"]
-        text_color = config["subtitle_color"]
-        outline_color = "black"
-        outline_width = 2
+    intro = final_clip.subclip(0, caption_duration)
+    after_blur_clip = final_clip.subclip(caption_duration)
 
-        # Create a transparent subtitle text (no bg_color) and center it, with outline
-        ai_subtitle = TextClip(caption, fontsize=80, color=text_color, font=font_path, method='caption', size=(final_clip.w * 0.9, None), stroke_width=outline_width, stroke_color=outline_color)
-        ai_subtitle = ai_subtitle.set_position(('center', 'center')).set_duration(caption_duration)
+    # Caption text is rasterized once and blended onto the blurred frames
+    caption_sprite = None
+    if draw_caption:
+        caption_sprite = render_sprite(caption, config["font_path"], CAPTION_FONT_SIZE, config["subtitle_color"], int(final_clip.w * 0.9))
+        sprite_h, sprite_w = caption_sprite.shape[:2]
+        caption_position = ((final_clip.w - sprite_w) // 2, (final_clip.h - sprite_h) // 2)
 
-        # Composite subtitle on top of the blurred video only (not the full final_clip)
-        blur_clip_with_subtitle = CompositeVideoClip([blur_clip, ai_subtitle])
+    blur = FrameBlur(sigma=5)
 
-        # Combine subtitle-blurred part with the rest of the video
-        final_clip = concatenate_videoclips([blur_clip_with_subtitle, after_blur_clip])
+    def intro_frame(frame):
+        frame = blur(frame)
+        if caption_sprite is not None:
+            frame = blend_sprite(frame, caption_sprite, *caption_position)
+        return frame
 
-    # Export final video
-    final_clip.write_videofile(output_video, codec='libx264', audio_codec='aac', fps=30)
+    # Blur the video during the AI speaking portion
+    if config.get("caption_intro_mode") == "freeze":
+        blurred_intro = ImageClip(intro_frame(intro.get_frame(0))).set_duration(caption_duration).set_audio(intro.audio)
+    else:
+        blurred_intro = intro.fl_image(intro_frame)
+
+    # Combine blurred part and rest of the video
+    return concatenate_videoclips([blurred_intro, after_blur_clip])
+
+def render_moments(video_path, moments, caption_voices, clip_transcripts, output_dir="temp", threads=None, on_rendered=None, filler_pool=None):
+    """Renders every moment with `render_moment`, saving its metadata like `trim_video` does.
+
+    `on_rendered(moment, output_video)` is called as soon as each clip is written and may return
+    a new path for it (e.g. after checkpointing it).
+    """
+    final_clips = []
+
+    for moment, voice, clip_transcript in zip(moments, caption_voices, clip_transcripts):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        video_title = moment['video_title']
+        output_video = f"{output_dir}/{video_title}_{timestamp}.mp4"
+
+        render_moment(video_path, moment, output_video, resolve_voice(voice), clip_transcript, threads=threads, filler_pool=filler_pool)
+        if on_rendered:
+            output_video = on_rendered(moment, output_video) or output_video
+        final_clips.append(output_video)
+
+        save_clip_metadata(moment, f"{video_title}_{timestamp}.json")
+
+    return final_clips
+
+def render_moment(video_path, moment, output_video, voice_caption=None, transcript=None, threads=None, filler_pool=None):
+    """
+    Renders one moment straight from the source video in a single encode.
+
+    The moment window, reel layout, subtitles and caption intro are all built as one MoviePy
+    graph and written once, instead of trim_video / format_for_youtube_reels / add_subtitles /
+    process_video each writing an intermediate H.264 file.
+
+    Parameters:
+    - video_path (str): Source video.
+    - moment (dict): Moment with "start", "end" and "caption".
+    - output_video (str): Final output file.
+    - voice_caption (str): Optional AI voice file played over the blurred intro.
+    - transcript (list): Clip-relative transcript used for subtitles.
+    - threads (int): Threads given to the ffmpeg encode (None lets ffmpeg decide).
+    - filler_pool (list): Prepared game fillers for format two (see `prepare_filler_pool`).
+    """
+    config = load_config()
+
+    source = VideoFileClip(video_path)
+    clip = source.subclip(float(moment["start"]), float(moment["end"]))
+    print(f"🎞️ Rendering {output_video}: {moment['caption']} ({moment['start']} - {moment['end']})")
+
+    final_clip, layout_clips = build_reel_layout(clip, config["video_type"], filler_pool)
+    use_ass = config.get("subtitle_backend") == "ass"
+
+    if config["add_subtitles"]:
+        if transcript is None:
+            raise ValueError("Fused render needs the clip transcript for subtitles.")
+        if not use_ass:
+            final_clip = overlay_subtitles(final_clip, transcript, config)
+
+    ffmpeg_params = None
+    if use_ass:
+        subtitle_lines = transcript if config["add_subtitles"] else None
+        ffmpeg_params = ass_encode_params(output_video, final_clip.size, config, subtitle_lines, moment["caption"], voice_caption)
+
+    if voice_caption is not None:
+        final_clip = add_caption_intro(final_clip, voice_caption, moment["caption"], config, draw_caption=not use_ass)
+
+    with span("render_moment", output=output_video, frames=int(final_clip.duration * 30)):
+        final_clip.write_videofile(output_video, codec='libx264', audio_codec='aac', fps=30, threads=threads, ffmpeg_params=ffmpeg_params)
     final_clip.close()
+    for layout_clip in layout_clips:
+        layout_clip.close()
+    source.close()
     print(f"✅ Final processed video saved as {output_video}")
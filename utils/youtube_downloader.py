@@ -1,18 +1,68 @@
-import yt_dlp
+import os
+from utils.instrumentation import instrument
+
+@instrument()
+def download_video(url, output_dir="temp", cancel=None):
+    """
+    Downloads the video to `output_dir/temp_video.mp4`. Setting the `cancel` event (a
+    `threading.Event`) from another thread stops the download at its next progress update.
+    """
+    import yt_dlp
+
+    output_path = f"{output_dir}/temp_video.mp4"
+
+    def remove_leftovers():
+        for leftover in (output_path, f"{output_path}.part"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    def check_cancelled(progress):
+        if cancel is not None and cancel.is_set():
+            raise yt_dlp.utils.DownloadCancelled("Video download cancelled")
 
-def download_video(url):
     try:
         print(f"📥 Downloading video from: {url}")
-        
+        # Callers only download when there's no fresh copy, so anything already here is stale
+        # (e.g. rejected by the cache manifest); yt-dlp would otherwise skip or resume from it
+        remove_leftovers()
+
         ydl_opts = {
             'format': 'best',
-            'outtmpl': 'temp/temp_video.mp4',
+            'outtmpl': output_path,
+            'overwrites': True,
+            'progress_hooks': [check_cancelled],
         }
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             ydl.download([url])
 
-        print(f"✅ Video downloaded: temp_video.mp4")
-        return "temp/temp_video.mp4"
+        print(f"✅ Video downloaded: {output_path}")
+        return output_path
+    except yt_dlp.utils.DownloadCancelled:
+        print(f"🛑 Video download cancelled: {url}")
+        remove_leftovers()
+        return None
     except Exception as e:
         print(f"❌ Error downloading video: {e}")
         return None
+
+@instrument()
+def download_audio(url, output_dir="temp"):
+    """Downloads only the audio stream, so transcription can start before the video finishes downloading."""
+    import yt_dlp
+
+    try:
+        print(f"📥 Downloading audio from: {url}")
+
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': f'{output_dir}/temp_audio.%(ext)s',
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            audio_path = ydl.prepare_filename(info)
+
+        print(f"✅ Audio downloaded: {audio_path}")
+        return audio_path
+    except Exception as e:
+        print(f"❌ Error downloading audio: {e}")
+        return None
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import os
+import utils
+from main import process_source
+from utils.checkpoints import evict_source_cache
+from utils.instrumentation import set_enabled, export_chrome_trace, print_summary
+from utils.job_queue import open_queue, enqueue, claim_next, set_stage, finish_job, fail_job, requeue_interrupted, list_jobs
+from utils.model_registry import evict_idle_models
+
+# Default number of jobs allowed in each stage at once
+STAGE_CONCURRENCY = {
+    "download": 2,
+    "transcribe": 1,
+    "llm": 2,
+    "render": 1,
+}
+
+
+def stage_concurrency(config):
+    """How many jobs may run each stage at once, from the `worker_<stage>_concurrency` settings."""
+    return {stage: config.get(f"worker_{stage}_concurrency", default) for stage, default in STAGE_CONCURRENCY.items()}
+
+
+async def run_job(connection, job, limits):
+    """Runs one queued job in its own workspace and records the outcome in the queue."""
+    job_dir = utils.create_workspace(f"job_{job['id']}")
+    print(f"▶️ Job {job['id']}: {job['source']}")
+
+    try:
+        final_clips = await process_source(
+            job["source"], job_dir, limits=limits,
+            on_stage=lambda stage: set_stage(connection, job["id"], stage), evict_cache=False,
+        )
+        if final_clips is None:
+            fail_job(connection, job["id"], "Pipeline stopped early (see the log).")
+        else:
+            finish_job(connection, job["id"], final_clips)
+            print(f"🎉 Job {job['id']} done: {final_clips}")
+    except Exception as e:
+        print(f"❌ Job {job['id']} failed: {e}")
+        fail_job(connection, job["id"], e)
+    finally:
+        utils.cleanup_temp_files(job_dir)
+        if os.path.isdir(job_dir):
+            os.rmdir(job_dir)
+
+
+async def run_worker(once=False):
+    """
+    Long-running service: pulls jobs from the queue and keeps up to `worker_max_jobs` of them in
+    flight. Each stage has its own concurrency limit, so while one job renders the next ones are
+    already downloading and transcribing, and Whisper/TTS/Gemini stay loaded between jobs.
+
+    With `once` the worker exits when the queue is empty instead of polling for new jobs.
+    """
+    config = utils.load_config()
+    connection = open_queue(config.get("job_queue_file", "cache/jobs.sqlite3"))
+    concurrency = stage_concurrency(config)
+    limits = {stage: asyncio.Semaphore(size) for stage, size in concurrency.items()}
+    max_jobs = config.get("worker_max_jobs", 4)
+    poll_seconds = config.get("worker_poll_seconds", 5)
+
+    interrupted = requeue_interrupted(connection)
+    if interrupted:
+        print(f"🔁 Re-queued {interrupted} interrupted jobs.")
+
+    print(f"👷 Worker started: up to {max_jobs} jobs, stage limits {concurrency}")
+    active = set()
+    while True:
+        while len(active) < max_jobs:
+            job = claim_next(connection)
+            if job is None:
+                break
+            active.add(asyncio.create_task(run_job(connection, job, limits)))
+
+        if not active:
+            if once:
+                break
+
+            # Idle: trim the source cache and release models nobody used for a while
+            if config.get("resume_from_cache", False):
+                evict_source_cache(
+                    config.get("source_cache_dir", "cache/sources"),
+                    max_age_days=config.get("source_cache_max_age_days"),
+                    max_total_mb=config.get("source_cache_max_mb"),
+                )
+            evict_idle_models(config.get("model_idle_seconds"))
+            await asyncio.sleep(poll_seconds)
+            continue
+
+        _, active = await asyncio.wait(active, timeout=poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+
+    print("✅ Queue empty, worker stopping.")
+
+
+def print_jobs(connection, status=None):
+    for job in list_jobs(connection, status):
+        detail = job["error"] if job["status"] == "failed" else job["stage"] or ""
+        print(f"{job['id']:>5}  {job['status']:<8} {detail:<40} {job['source']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Job queue and long-running worker for batches of sources.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Queue YouTube URLs or local video files.")
+    enqueue_parser.add_argument("sources", nargs="*", help="URLs or file paths.")
+    enqueue_parser.add_argument("--file", help="Text file with one source per line.")
+
+    run_parser = commands.add_parser("run", help="Process queued jobs, keeping models warm between them.")
+    run_parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+
+    status_parser = commands.add_parser("status", help="List jobs.")
+    status_parser.add_argument("--status", choices=["queued", "running", "done", "failed"])
+
+    args = parser.parse_args()
+    config = utils.load_config()
+
+    if args.command == "enqueue":
+        sources = list(args.sources)
+        if args.file:
+            with open(args.file, "r", encoding="utf-8") as file:
+                sources += [line.strip() for line in file if line.strip() and not line.startswith("#")]
+        job_ids = enqueue(open_queue(config.get("job_queue_file", "cache/jobs.sqlite3")), sources)
+        print(f"📥 Queued {len(job_ids)} jobs.")
+    elif args.command == "status":
+        print_jobs(open_queue(config.get("job_queue_file", "cache/jobs.sqlite3")), args.status)
+    else:
+        set_enabled(config.get("instrumentation", True))
+        try:
+            asyncio.run(run_worker(once=args.once))
+        finally:
+            if config.get("instrumentation", True):
+                print_summary()
+                export_chrome_trace(config.get("trace_file", "trace.json"))